@@ -1,7 +1,12 @@
+import logging
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from backend.app.models.user import User
 from backend.app.utils.security import get_password_hash
 
+logger = logging.getLogger(__name__)
+
 
 def get_user(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
@@ -22,9 +27,81 @@ def delete_user(db: Session, user: User):
 
 
 def create_user(db: Session, username: str, password: str):
-    hashed_password = get_password_hash(password)
+    return add_user(db, username, get_password_hash(password))
+
+
+def add_user(db: Session, username: str, hashed_password: str):
     db_user = User(username=username, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
+
+
+def update_password_hash(db: Session, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
+
+async def get_user_async(db: AsyncSession, username: str):
+    return await db.scalar(select(User).where(User.username == username))
+
+
+async def get_users_page_async(db: AsyncSession, limit: int, after_id: int | None = None,
+                               role: str | None = None, prefix: str | None = None):
+    # Only the listed columns are loaded, the password hashes never leave the database
+    query = select(User.id, User.username, User.role).order_by(User.id).limit(limit)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    if role:
+        query = query.where(User.role == role)
+    if prefix:
+        # LIKE ignores the case on SQLite, the exact comparison makes the prefix match like username equality:
+        # case-sensitive on SQLite, following the column collation on MariaDB/MySQL
+        query = query.where(User.username.startswith(prefix, autoescape=True),
+                            func.substr(User.username, 1, len(prefix)) == prefix)
+    return [dict(row) for row in (await db.execute(query)).mappings()]
+
+
+async def delete_user_async(db: AsyncSession, user: User):
+    username = user.username
+    try:
+        await db.delete(user)
+        await db.commit()
+    except Exception:
+        logger.exception("Failed to delete user %s", username)
+        await db.rollback()
+        return False
+    return True
+
+
+async def add_user_async(db: AsyncSession, username: str, hashed_password: str):
+    db_user = User(username=username, hashed_password=hashed_password)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+async def update_password_hash_async(db: AsyncSession, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    await db.commit()
+
+
+async def update_role_async(db: AsyncSession, user: User, role: str):
+    user.role = role
+    await db.commit()
+
+
+async def get_existing_usernames_async(db: AsyncSession, usernames: list):
+    return set(await db.scalars(select(User.username).where(User.username.in_(usernames))))
+
+
+async def update_roles_async(db: AsyncSession, usernames: list, role: str):
+    await db.execute(update(User).where(User.username.in_(usernames)).values(role=role))
+    await db.commit()
+
+
+async def delete_users_async(db: AsyncSession, usernames: list):
+    await db.execute(delete(User).where(User.username.in_(usernames)))
+    await db.commit()
@@ -1,8 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from backend.app.routers import auth, users, forum
+from backend.app.routers import auth, users, forum, metrics
+from backend.app.utils.database import async_engine
+from backend.app.utils.indexes import ensure_indexes_async
+from backend.app.utils.mongodb import connect_async_client, close_async_client, get_async_database
+from backend.app.utils.images import image_pool
+from backend.app.utils.jobs import job_worker
+from backend.app.utils.metrics import MetricsMiddleware, mark_process_dead
+from backend.app.utils.profiling import ProfilingMiddleware
+from backend.app.utils.security import password_pool
+from backend.app.utils.storage import get_blob_store
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect_async_client()
+    await ensure_indexes_async(get_async_database())
+    job_worker.start(get_async_database(), get_blob_store(get_async_database()))
+    yield
+    await job_worker.stop()
+    close_async_client()
+    await async_engine.dispose()
+    password_pool.shutdown()
+    image_pool.shutdown()
+    mark_process_dead()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(forum.router, prefix="/forum", tags=["forum"])
+app.include_router(metrics.router, tags=["metrics"])
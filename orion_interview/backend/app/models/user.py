@@ -1,13 +1,19 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
 from backend.app.utils.database import Base
 
+# MariaDB/MySQL need a length for every VARCHAR column
+USERNAME_MAX_LENGTH = 64
+PASSWORD_HASH_MAX_LENGTH = 255
+ROLE_MAX_LENGTH = 16
+
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
-    role = Column(String, default="user")
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    username: Mapped[str] = mapped_column(String(USERNAME_MAX_LENGTH), unique=True, index=True, nullable=False)
+    hashed_password: Mapped[str] = mapped_column(String(PASSWORD_HASH_MAX_LENGTH), nullable=False)
+    role: Mapped[str | None] = mapped_column(String(ROLE_MAX_LENGTH), default="user")
 
     def as_dict(self, exclude=None):
         exclude = exclude or []
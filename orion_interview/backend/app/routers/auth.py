@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.app.crud import user as crud_user
 from backend.app.utils import security, dependencies
 from backend.app.schemas import user as schemas_user
@@ -9,16 +9,17 @@ router = APIRouter()
 
 
 @router.post("/login", response_model=schemas_user.Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(dependencies.get_db),
+    db: AsyncSession = Depends(dependencies.get_async_db),
 ):
     """
-    Route used to login the user
+    Route used to login the user. The password is verified inside the password hashing process pool,
+    and its hash is upgraded if it was computed with outdated parameters.
 
     Args:
         form_data (OAuth2PasswordRequestForm, optional): data received will contain username and password . Defaults to Depends().
-        db (Session, optional): Connector to the sqlite database. Defaults to Depends(dependencies.get_db).
+        db (AsyncSession, optional): Connector to the users database. Defaults to Depends(dependencies.get_async_db).
 
     Raises:
         HTTPException: If the username/password combination is invalid, a 401 HTTP Response will be sent
@@ -26,13 +27,19 @@ def login(
     Returns:
         dict: A dictionary containing the access_token and the token_type
     """
-    user = crud_user.get_user(db, form_data.username)
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    user = await crud_user.get_user_async(db, form_data.username)
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await security.verify_and_update_password_async(
+            form_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        await crud_user.update_password_hash_async(db, user, new_hash)
     access_token = security.create_access_token(
         data={"username": user.username,  "role": user.role})
     return {"access_token": access_token, "token_type": "bearer"}
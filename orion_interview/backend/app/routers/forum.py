@@ -1,77 +1,169 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from typing import List
+import base64
+import binascii
+import json
+import time
+import zlib
+from collections import Counter
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Annotated
 from datetime import datetime
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
-from backend.app.utils.mongodb import get_database
-from backend.app.schemas.post import Post, PostUpdate
-from backend.app.utils.security import SECRET_KEY, ALGORITHM
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
+from pymongo import DESCENDING
+from pymongo.errors import BulkWriteError
+from backend.app.utils import dependencies
+from backend.app.utils.counters import increment_post_count, increment_post_counts
+from backend.app.utils.images import PHOTO_MAX_UPLOAD_SIZE, THUMBNAIL_SIZES, InvalidPhoto, delete_photo, save_photo
+from backend.app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from backend.app.utils.response_cache import etag_matches, response_cache
+from backend.app.utils.storage import BlobNotFound, BlobStore
+from backend.app.schemas.post import Post, PostImportReport, PostPage, PostSearchPage, PostUpdate
 
 router = APIRouter()
 
-db = get_database()
-posts_collection = db["posts"]
+POSTS_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+PHOTO_CHUNK_SIZE = 256 * 1024
+PHOTO_CACHE_CONTROL = "private, no-cache"
+POSTS_CACHE_CONTROL = "private, no-cache"
+EXPORT_DEFAULT_BATCH_SIZE = 1000
+EXPORT_MAX_BATCH_SIZE = 10000
+IMPORT_DEFAULT_BATCH_SIZE = 1000
+IMPORT_MAX_BATCH_SIZE = 10000
+IMPORT_MAX_LINE_SIZE = 1024 * 1024
+IMPORT_MAX_REPORTED_ERRORS = 100
+SEARCH_MAX_QUERY_LENGTH = 200
+SEARCH_SNIPPET_LENGTH = 200
+
+
+def convert_post_obj(post: dict):
+    """
+    Method is mainly used to replace the data type of "_id" key from bson ObjectId format to str
+
+    Args:
+        post (dict): This is a forum post extracted from the MongoDB
+
+    Returns:
+        dict: The modified post dictionary
+    """
+    return {
+        **post,
+        "_id": str(post["_id"])
+    }
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+async def store_photo(photo: str, blob_store: BlobStore):
     """
-    Method will decode the given token and will extract the information it holds (username, role)
+    Method will decode a base64 encoded photo, validate and re-encode it inside the image worker pool
+    and save it, with its thumbnails, inside the blob store
 
     Args:
-        token (str, optional): The generated JWT token. Defaults to Depends(oauth2_scheme).
+        photo (str): The photo content, encoded using base64
+        blob_store (BlobStore): The store the photo will be saved into
 
     Raises:
-        HTTPException: If any errors occur, a corresponding HTTP Error will be raised
+        HTTPException: If the photo is too large a 413 HTTP response will be sent,
+            if it is not a base64 encoded JPEG or PNG image a 400 one
 
     Returns:
-        dict: The decoded JWT data, in dictionary format
+        dict: The "photo_id" and "thumbnails" fields of the post
     """
+    if len(photo) // 4 * 3 > PHOTO_MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Photo is too large.")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("username")
-        role = payload.get("role")
-        if username is None or role is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return {"username": username, "role": role}
-    except JWTError:
+        data = base64.b64decode(photo, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Photo must be base64 encoded.")
+    try:
+        return await save_photo(data, blob_store)
+    except InvalidPhoto as error:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
 
 
-def convert_post_obj(post: dict):
+def parse_range_header(range_header: str, size: int):
     """
-    Method is mainly used to replace the data type of "_id" key from bson ObjectId format to str
+    Method will parse a single "bytes" range of a Range header
 
     Args:
-        post (dict): This is a forum post extracted from the MongoDB
+        range_header (str): The value of the Range header
+        size (int): The size of the served content
+
+    Raises:
+        ValueError: If the range can't be satisfied for the given size
 
     Returns:
-        dict: The modified post dictionary
+        tuple | None: The (start, end) inclusive byte positions, or None if the header should be ignored
     """
-    return {
-        **post,
-        "_id": str(post["_id"])
-    }
+    unit, _, byte_range = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in byte_range:
+        return None
+    first, _, last = byte_range.strip().partition("-")
+    if not (first or last) or not (first or "0").isdigit() or not (last or "0").isdigit():
+        return None
+
+    if not first:
+        suffix_length = int(last)
+        if suffix_length == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(size - suffix_length, 0), size - 1
+
+    start, end = int(first), int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+async def iter_blob(blob, start: int, length: int):
+    """
+    Async generator reading a byte range of a blob in chunks of PHOTO_CHUNK_SIZE. The blob is closed at the end.
+    """
+    try:
+        blob.seek(start)
+        while length > 0:
+            chunk = await blob.read(min(PHOTO_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        blob.close()
+
+
+def cached_json_response(cached: tuple, if_none_match: str | None):
+    """
+    Method will build the response of a cached (etag, body) JSON payload
+
+    Args:
+        cached (tuple): The ETag and the serialized body
+        if_none_match (str | None): The If-None-Match header of the request
+
+    Returns:
+        Response: The body, or an empty 304 response if the client copy is still valid
+    """
+    etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": POSTS_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.post("/posts")
-def create_post(post: PostUpdate, current_user: dict = Depends(get_current_user)):
+async def create_post(post: PostUpdate, current_user: dict = Depends(dependencies.get_current_user),
+                      mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db),
+                      blob_store: BlobStore = Depends(dependencies.get_blob_store)):
     """
     Method is used to create a post inside the forum
 
     Args:
         post (PostUpdate): The new post that will be saved inside the MongoDB
-        current_user (dict, optional): The user making the request. Defaults to Depends(get_current_user).
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+        blob_store (BlobStore, optional): The store of the post photos. Defaults to Depends(dependencies.get_blob_store).
 
     Raises:
         HTTPException: If the post can't be inserted inside the MongoDB, a 500 HTTP response will be sent
@@ -79,65 +171,544 @@ def create_post(post: PostUpdate, current_user: dict = Depends(get_current_user)
     Returns:
         dict: A success message
     """
-    post_data = post.model_dump()
+    post_data = post.model_dump(exclude={"photo"})
+    post_data.update({"photo_id": None, "thumbnails": None})
+    if post.photo:
+        post_data.update(await store_photo(post.photo, blob_store))
     post_data["author"] = current_user["username"]
     post_data["created_at"] = datetime.now()
-    result = posts_collection.insert_one(post_data)
+    result = await mongo_db["posts"].insert_one(post_data)
     if not result.inserted_id:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Post could not be created.")
+    await increment_post_count(mongo_db, post_data["author"])
+    await response_cache.invalidate(mongo_db)
     return {"message": "Post created successfully."}
 
 
-@router.get("/posts", response_model=List[Post])
-def get_posts(current_user: dict = Depends(get_current_user)):
+@router.get("/posts", response_model=PostPage)
+async def get_posts(limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+                    cursor: str | None = None,
+                    if_none_match: Annotated[str | None, Header(alias="If-None-Match")] = None,
+                    current_user: dict = Depends(dependencies.get_current_user),
+                    mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db)):
+    """
+    Method will return a page of forum posts, newest first.
+    Pages are delimited by (created_at, _id), so fetching a deep page costs the same as fetching the first one.
+    Serialized pages are cached until the next write to the posts, and revalidated using their ETag.
+
+    Args:
+        limit (int, optional): Maximum number of posts returned. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str | None, optional): The next_cursor received with the previous page. Defaults to None.
+        if_none_match (str | None, optional): The If-None-Match header of the request. Defaults to None.
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+
+    Raises:
+        HTTPException: If the cursor is malformed, a 400 HTTP response will be sent
+
+    Returns:
+        Response: The PostPage with the posts of the page and the cursor of the next page (None if this is the last page),
+            or an empty 304 response if the client copy is still valid
     """
-    Method will return all the posts for the forum
+    version = await response_cache.get_version(mongo_db)
+    cache_key = ("posts", limit, cursor)
+    cached = response_cache.get(cache_key, version)
+    if cached:
+        return cached_json_response(cached, if_none_match)
+
+    query = {}
+    if cursor:
+        try:
+            position = decode_cursor(cursor, {"created_at": datetime, "_id": ObjectId})
+            query = {"$or": [
+                {"created_at": {"$lt": position["created_at"]}},
+                {"created_at": position["created_at"],
+                    "_id": {"$lt": position["_id"]}},
+            ]}
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+    posts = await mongo_db["posts"].find(query, {"photo": 0}).sort(POSTS_SORT).limit(limit + 1).to_list(None)
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(
+            {"created_at": posts[-1]["created_at"], "_id": posts[-1]["_id"]})
+
+    page = PostPage.model_validate({
+        "posts": [convert_post_obj(post) for post in posts],
+        "next_cursor": next_cursor
+    })
+    cached = response_cache.put(cache_key, version, page.model_dump_json(by_alias=True).encode("utf-8"))
+    return cached_json_response(cached, if_none_match)
+
+
+def search_pipeline(q: str, position: dict | None, limit: int):
+    """
+    Method will build the aggregation pipeline of a search page
 
     Args:
-        current_user (dict, optional): The user making the request. Defaults to Depends(get_current_user).
+        q (str): The searched words, in MongoDB $text syntax
+        position (dict | None): The (score, _id) of the last result of the previous page, None for the first page
+        limit (int): Maximum number of results returned
 
     Returns:
-        List[Post]: A list of Post objects
+        list: The pipeline stages
     """
-    posts = posts_collection.find()
-    return [
-        convert_post_obj(post)
-        for post in posts
+    pipeline: list[dict] = [
+        {"$match": {"$text": {"$search": q}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if position:
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": position["score"]}},
+            {"score": position["score"], "_id": {"$lt": position["_id"]}},
+        ]}})
+    # The snippet is only cut from the documents of the page, after the sort and the limit
+    return pipeline + [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "title": 1,
+            "author": 1,
+            "created_at": 1,
+            "score": 1,
+            "snippet": {"$substrCP": ["$content", 0, SEARCH_SNIPPET_LENGTH]},
+        }},
     ]
 
 
+@router.get("/posts/search", response_model=PostSearchPage)
+async def search_posts(q: Annotated[str, Query(min_length=1, max_length=SEARCH_MAX_QUERY_LENGTH)],
+                       limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+                       cursor: str | None = None,
+                       if_none_match: Annotated[str | None, Header(alias="If-None-Match")] = None,
+                       current_user: dict = Depends(dependencies.get_current_user),
+                       mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db)):
+    """
+    Method will return a page of the posts matching the searched words, most relevant first.
+    The search is answered by the title_content_text index, and only the fields needed to display a snippet are returned.
+    Pages are delimited by (score, _id) and cached until the next write to the posts, like the pages of get_posts.
+
+    Args:
+        q (str): The searched words. Phrases ("...") and excluded words (-word) are supported.
+        limit (int, optional): Maximum number of results returned. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str | None, optional): The next_cursor received with the previous page. Defaults to None.
+        if_none_match (str | None, optional): The If-None-Match header of the request. Defaults to None.
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+
+    Raises:
+        HTTPException: If the cursor is malformed, a 400 HTTP response will be sent
+
+    Returns:
+        Response: The PostSearchPage with the results of the page and the cursor of the next page (None if this is the
+            last page), or an empty 304 response if the client copy is still valid
+    """
+    version = await response_cache.get_version(mongo_db)
+    cache_key = ("search", q, limit, cursor)
+    cached = response_cache.get(cache_key, version)
+    if cached:
+        return cached_json_response(cached, if_none_match)
+
+    position = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor, {"score": (int, float), "_id": ObjectId})
+            position = {"score": float(position["score"]), "_id": position["_id"]}
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+    results = await mongo_db["posts"].aggregate(search_pipeline(q, position, limit + 1)).to_list(None)
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor({"score": results[-1]["score"], "_id": results[-1]["_id"]})
+
+    page = PostSearchPage.model_validate({
+        "results": [convert_post_obj(result) for result in results],
+        "next_cursor": next_cursor
+    })
+    cached = response_cache.put(cache_key, version, page.model_dump_json(by_alias=True).encode("utf-8"))
+    return cached_json_response(cached, if_none_match)
+
+
+def json_default(value):
+    """
+    json.dumps default for the BSON values of the posts: datetimes as ISO 8601, ObjectIds (e.g. GridFS photo ids)
+    as strings. Any other type raises a TypeError.
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def iter_posts_ndjson(cursor, batch_size: int, compress: bool):
+    """
+    Async generator serializing the posts of a cursor as NDJSON, one chunk per batch_size posts.
+    Only one batch is held in memory at a time. The cursor is closed at the end, even if the client disconnects.
+    """
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    lines = []
+    try:
+        async for post in cursor:
+            lines.append(json.dumps(convert_post_obj(post), default=json_default) + "\n")
+            if len(lines) >= batch_size:
+                chunk = "".join(lines).encode("utf-8")
+                lines = []
+                yield compressor.compress(chunk) if compressor else chunk
+        chunk = "".join(lines).encode("utf-8")
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush()
+        if chunk:
+            yield chunk
+    finally:
+        await cursor.close()
+
+
+@router.get("/posts/export")
+async def export_posts(batch_size: Annotated[int, Query(ge=1, le=EXPORT_MAX_BATCH_SIZE)] = EXPORT_DEFAULT_BATCH_SIZE,
+                       gzip: bool = False,
+                       current_user: dict = Depends(dependencies.get_current_user),
+                       mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db)):
+    """
+    Method will stream all the forum posts as NDJSON, one post per line, in insertion order.
+    The posts are read from the database batch_size at a time, so the memory used does not depend on the number of posts.
+
+    Args:
+        batch_size (int, optional): Number of posts fetched from the database at once. Defaults to EXPORT_DEFAULT_BATCH_SIZE.
+        gzip (bool, optional): Compress the export using gzip. Defaults to False.
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+
+    Raises:
+        HTTPException: If the user is not an admin, a 403 HTTP response will be sent
+
+    Returns:
+        StreamingResponse: The NDJSON export, as an attachment
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can export posts.")
+
+    cursor = mongo_db["posts"].find({}, {"photo": 0}).sort("_id", 1).batch_size(batch_size)
+    filename, media_type = "posts.ndjson", "application/x-ndjson"
+    if gzip:
+        filename, media_type = "posts.ndjson.gz", "application/gzip"
+    return StreamingResponse(iter_posts_ndjson(cursor, batch_size, gzip), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+async def iter_gunzip(chunks):
+    """
+    Async generator decompressing a gzip stream. Every chunk is inflated at most IMPORT_MAX_LINE_SIZE bytes at a time,
+    so a small, highly compressed, request can't expand in memory. Raises zlib.error if the stream is truncated
+    or followed by other data.
+    """
+    decompressor = zlib.decompressobj(wbits=31)
+    async for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk, IMPORT_MAX_LINE_SIZE)
+            chunk = decompressor.unconsumed_tail
+        if decompressor.unused_data:
+            raise zlib.error("Data after the end of the gzip stream.")
+    if not decompressor.eof:
+        raise zlib.error("Truncated gzip stream.")
+
+
+async def iter_ndjson_lines(chunks):
+    """
+    Async generator splitting a stream of byte chunks into (line number, line) tuples, blank lines are skipped.
+    Lines longer than IMPORT_MAX_LINE_SIZE are dropped while they stream in, and returned as None.
+    """
+    buffer, line_number, oversized = b"", 0, False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if oversized:
+                oversized = False
+                yield line_number, None
+            elif len(line) > IMPORT_MAX_LINE_SIZE:
+                yield line_number, None
+            elif line.strip():
+                yield line_number, line
+        if len(buffer) > IMPORT_MAX_LINE_SIZE:
+            oversized, buffer = True, b""
+    if oversized or buffer.strip():
+        yield line_number + 1, None if oversized else buffer
+
+
+def parse_post_line(line: bytes):
+    """
+    Method will validate an NDJSON line against the Post schema and build the document to insert
+
+    Args:
+        line (bytes): A line of the import, containing a single post
+
+    Raises:
+        ValueError: If the line is not a valid post
+
+    Returns:
+        dict: The post document. The "_id" of the line is kept, created_at defaults to the import time.
+            Photos are not imported: photo_id and thumbnails are dropped, the blobs they point to may be used
+            by other posts (or not exist) and deleting the imported post would delete them.
+    """
+    try:
+        post = Post.model_validate_json(line)
+    except ValidationError as error:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(loc) for loc in detail['loc']) or 'line'}: {detail['msg']}" for detail in error.errors()))
+    if not post.author:
+        raise ValueError("author: Field required")
+
+    document = post.model_dump(exclude={"id"})
+    document.update({"photo_id": None, "thumbnails": None})
+    if post.id is not None:
+        try:
+            document["_id"] = ObjectId(post.id)
+        except InvalidId:
+            raise ValueError("_id: Invalid ObjectId")
+    if document["created_at"] is None:
+        document["created_at"] = datetime.now()
+    return document
+
+
+async def insert_post_batch(mongo_db: AsyncIOMotorDatabase, documents: list, line_numbers: list):
+    """
+    Method will insert a batch of imported posts with a single unordered insert_many, and update the post counters
+
+    Args:
+        mongo_db (AsyncIOMotorDatabase): The forum database
+        documents (list): The post documents
+        line_numbers (list): The import line of every document
+
+    Returns:
+        tuple: The number of inserted posts and the (line number, error) of every rejected one
+    """
+    failed = {}
+    try:
+        await mongo_db["posts"].insert_many(documents, ordered=False)
+    except BulkWriteError as error:
+        failed = {write_error["index"]: write_error["errmsg"] for write_error in error.details["writeErrors"]}
+    await increment_post_counts(mongo_db, Counter(
+        document["author"] for index, document in enumerate(documents) if index not in failed))
+    return len(documents) - len(failed), [(line_numbers[index], message) for index, message in failed.items()]
+
+
+@router.post("/posts/import", response_model=PostImportReport)
+async def import_posts(request: Request,
+                       batch_size: Annotated[int, Query(ge=1, le=IMPORT_MAX_BATCH_SIZE)] = IMPORT_DEFAULT_BATCH_SIZE,
+                       content_encoding: Annotated[str | None, Header(alias="Content-Encoding")] = None,
+                       current_user: dict = Depends(dependencies.get_current_user),
+                       mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db)):
+    """
+    Method will import posts from an NDJSON request body, one post per line (the format of the export).
+    The body is validated while it streams in and written batch_size posts at a time, so it is never fully held in memory.
+    Invalid lines are skipped and reported, the other posts are imported.
+
+    Args:
+        request (Request): The request, whose body is the NDJSON import (gzip compressed if Content-Encoding is gzip)
+        batch_size (int, optional): Number of posts written to the database at once. Defaults to IMPORT_DEFAULT_BATCH_SIZE.
+        content_encoding (str | None, optional): The Content-Encoding header of the request. Defaults to None.
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+
+    Raises:
+        HTTPException: If the user is not an admin a 403 HTTP response will be sent,
+            if the body encoding is not supported a 415 one and if the gzip stream is corrupted a 400 one
+
+    Returns:
+        PostImportReport: The number of imported and rejected posts, the first errors and the import throughput
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can import posts.")
+
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding not in ("identity", "gzip"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported Content-Encoding.")
+    chunks = iter_gunzip(request.stream()) if encoding == "gzip" else request.stream()
+
+    started = time.perf_counter()
+    imported, failed = 0, 0
+    errors: list[dict] = []
+    documents: list[dict] = []
+    line_numbers: list[int] = []
+
+    def report_error(line_number: int, error: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append({"line": line_number, "error": error})
+
+    async def flush():
+        nonlocal imported
+        inserted, batch_errors = await insert_post_batch(mongo_db, documents, line_numbers)
+        if inserted:
+            await response_cache.invalidate(mongo_db)
+        imported += inserted
+        for line_number, error in batch_errors:
+            report_error(line_number, error)
+        documents.clear()
+        line_numbers.clear()
+
+    try:
+        async for line_number, line in iter_ndjson_lines(chunks):
+            if line is None:
+                report_error(line_number, f"Line is longer than {IMPORT_MAX_LINE_SIZE} bytes.")
+                continue
+            try:
+                documents.append(parse_post_line(line))
+                line_numbers.append(line_number)
+            except ValueError as error:
+                report_error(line_number, str(error))
+            if len(documents) >= batch_size:
+                await flush()
+    except zlib.error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Request body is not valid gzip.")
+    if documents:
+        await flush()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "posts_per_second": round(imported / elapsed, 2) if elapsed else 0.0,
+    }
+
+
 @router.get("/posts/{id}", response_model=Post)
-def get_post(id: str, current_user: dict = Depends(get_current_user)):
+async def get_post(id: str, if_none_match: Annotated[str | None, Header(alias="If-None-Match")] = None,
+                   current_user: dict = Depends(dependencies.get_current_user),
+                   mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db)):
     """
-    Method will return the details of a certain post
+    Method will return the details of a certain post. Like the pages, the serialized post is cached until the next write.
 
     Args:
         id (str): id of the post
-        current_user (dict, optional): The user making the request. Defaults to Depends(get_current_user).
+        if_none_match (str | None, optional): The If-None-Match header of the request. Defaults to None.
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
 
     Raises:
         HTTPException: If the post is not found, a 404 HTTP response will be sent
 
     Returns:
-        dict: The post data
+        Response: The post data, or an empty 304 response if the client copy is still valid
     """
-    post = posts_collection.find_one({"_id": ObjectId(id)})
+    version = await response_cache.get_version(mongo_db)
+    cache_key = ("post", id)
+    cached = response_cache.get(cache_key, version)
+    if cached:
+        return cached_json_response(cached, if_none_match)
+
+    post = None
+    if ObjectId.is_valid(id):
+        post = await mongo_db["posts"].find_one({"_id": ObjectId(id)})
     if not post:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Post not found.")
-    return convert_post_obj(post)
+    body = Post.model_validate(convert_post_obj(post)).model_dump_json(by_alias=True).encode("utf-8")
+    return cached_json_response(response_cache.put(cache_key, version, body), if_none_match)
+
+
+@router.get("/posts/{id}/photo")
+async def get_post_photo(id: str,
+                         size: str | None = None,
+                         range_header: Annotated[str | None, Header(alias="Range")] = None,
+                         if_none_match: Annotated[str | None, Header(alias="If-None-Match")] = None,
+                         current_user: dict = Depends(dependencies.get_current_user),
+                         mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db),
+                         blob_store: BlobStore = Depends(dependencies.get_blob_store)):
+    """
+    Method will stream the photo of a certain post, or one of its thumbnails.
+    Single byte ranges and conditional requests are supported.
+
+    Args:
+        id (str): id of the post
+        size (str | None, optional): Name of the thumbnail size (see THUMBNAIL_SIZES), None for the original photo.
+            Defaults to None.
+        range_header (str | None, optional): The Range header of the request. Defaults to None.
+        if_none_match (str | None, optional): The If-None-Match header of the request. Defaults to None.
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+        blob_store (BlobStore, optional): The store of the post photos. Defaults to Depends(dependencies.get_blob_store).
+
+    Raises:
+        HTTPException: If the size is unknown a 400 HTTP response will be sent, if the post has no such photo a 404 one
+            and if the range is invalid a 416 one
+
+    Returns:
+        Response: The photo bytes (200 or 206), or an empty 304 response if the client copy is still valid
+    """
+    if size is not None and size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown photo size.")
+
+    post = None
+    if ObjectId.is_valid(id):
+        post = await mongo_db["posts"].find_one({"_id": ObjectId(id)}, {"photo_id": 1, "thumbnails": 1})
+    blob_id = post and (post.get("photo_id") if size is None else (post.get("thumbnails") or {}).get(size))
+    if not blob_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found.")
+
+    # Blobs are immutable, so their id is a strong validator for the photo content
+    etag = f'"{blob_id}"'
+    headers = {"ETag": etag, "Cache-Control": PHOTO_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        blob, length, content_type = await blob_store.open(blob_id)
+    except BlobNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found.")
+
+    start, end, status_code = 0, length - 1, status.HTTP_200_OK
+    if range_header:
+        try:
+            byte_range = parse_range_header(range_header, length)
+        except ValueError:
+            blob.close()
+            raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                                detail="Requested range not satisfiable.",
+                                headers={"Content-Range": f"bytes */{length}"})
+        if byte_range:
+            start, end = byte_range
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_blob(blob, start, end - start + 1), status_code=status_code,
+                             media_type=content_type, headers=headers)
 
 
 @router.put("/posts/{id}")
-def update_post(id: str, updated_post: PostUpdate, current_user: dict = Depends(get_current_user)):
+async def update_post(id: str, updated_post: PostUpdate, current_user: dict = Depends(dependencies.get_current_user),
+                      mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db),
+                      blob_store: BlobStore = Depends(dependencies.get_blob_store)):
     """
     Method is used to update a certain post
 
     Args:
         id (str): id of the post that will be updated
         updated_post (PostUpdate): The new post data
-        current_user (dict, optional): The user making the request. Defaults to Depends(get_current_user).
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+        blob_store (BlobStore, optional): The store of the post photos. Defaults to Depends(dependencies.get_blob_store).
 
     Raises:
         HTTPException: If any error occur, a corresponding HTTP Response will be sent
@@ -145,7 +716,9 @@ def update_post(id: str, updated_post: PostUpdate, current_user: dict = Depends(
     Returns:
         dict: A success message
     """
-    post = posts_collection.find_one({"_id": ObjectId(id)})
+    post = None
+    if ObjectId.is_valid(id):
+        post = await mongo_db["posts"].find_one({"_id": ObjectId(id)})
     if not post:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Post not found.")
@@ -154,25 +727,37 @@ def update_post(id: str, updated_post: PostUpdate, current_user: dict = Depends(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="You do not have permission to edit this post.")
 
-    updated_post = updated_post.model_dump()
-    updated_post["updated_at"] = datetime.now()
-    updated_post["author"] = post["author"]
-    result = posts_collection.update_one(
-        {"_id": ObjectId(id)}, {"$set": updated_post})
+    photo = updated_post.photo
+    fields = updated_post.model_dump(exclude={"photo"})
+    if photo:
+        fields.update(await store_photo(photo, blob_store))
+    fields["updated_at"] = datetime.now()
+    fields["author"] = post["author"]
+    result = await mongo_db["posts"].update_one(
+        {"_id": ObjectId(id)}, {"$set": fields})
     if result.modified_count == 0:
+        if photo:
+            await delete_photo(fields, blob_store)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Post not found or no changes made.")
+    await response_cache.invalidate(mongo_db)
+    if photo:
+        await delete_photo(post, blob_store)
     return {"message": "Post updated successfully."}
 
 
 @router.delete("/posts/{id}")
-def delete_post(id: str, current_user: dict = Depends(get_current_user)):
+async def delete_post(id: str, current_user: dict = Depends(dependencies.get_current_user),
+                      mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db),
+                      blob_store: BlobStore = Depends(dependencies.get_blob_store)):
     """
     Method will delete a certain post
 
     Args:
         id (str): id of the post
-        current_user (dict, optional): The user making the request. Defaults to Depends(get_current_user).
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+        blob_store (BlobStore, optional): The store of the post photos. Defaults to Depends(dependencies.get_blob_store).
 
     Raises:
         HTTPException: If any error occur, a corresponding HTTP Response will be sent
@@ -180,7 +765,9 @@ def delete_post(id: str, current_user: dict = Depends(get_current_user)):
     Returns:
         dict: A success message
     """
-    post = posts_collection.find_one({"_id": ObjectId(id)})
+    post = None
+    if ObjectId.is_valid(id):
+        post = await mongo_db["posts"].find_one({"_id": ObjectId(id)})
     if not post:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Post not found.")
@@ -189,8 +776,11 @@ def delete_post(id: str, current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="You do not have permission to delete this post.")
 
-    result = posts_collection.delete_one({"_id": ObjectId(id)})
+    result = await mongo_db["posts"].delete_one({"_id": ObjectId(id)})
     if result.deleted_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Post not found.")
+    await increment_post_count(mongo_db, post["author"], -1)
+    await response_cache.invalidate(mongo_db)
+    await delete_photo(post, blob_store)
     return {"message": "Post deleted successfully."}
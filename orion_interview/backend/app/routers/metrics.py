@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from backend.app.utils.metrics import generate_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Method is used to expose the backend metrics in the Prometheus text format: per route latency histograms and
+    status counts, MongoDB command and SQL query durations, and the saturation of the request threadpool.
+
+    Returns:
+        Response: The metrics of all the backend worker processes
+    """
+    return Response(generate_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -1,27 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError
-from sqlalchemy.orm import Session
+from bson.objectid import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Annotated
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.app.crud import user as crud_user
+from backend.app.models.user import ROLE_MAX_LENGTH, USERNAME_MAX_LENGTH
+from backend.app.schemas import job as schemas_job
 from backend.app.schemas import user as schemas_user
 from backend.app.utils import dependencies, security
-from backend.app.utils.mongodb import get_database
+from backend.app.utils.counters import get_post_count
+from backend.app.utils.jobs import JOBS_COLLECTION, create_delete_posts_job, job_worker
+from backend.app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 router = APIRouter()
 
-db = get_database()
-posts_collection = db["posts"]
+
+async def delete_users_posts(mongo_db: AsyncIOMotorDatabase, usernames: list):
+    """
+    Schedule the deletion of all the posts of the given users, with their photos and post counters, and return the
+    id of the job. The posts are deleted in the background by the job worker.
+    """
+    job_id = await create_delete_posts_job(mongo_db, usernames)
+    job_worker.notify()
+    return job_id
 
 
 @router.post("/register", response_model=schemas_user.Token)
-def register(user: schemas_user.UserCreate, db: Session = Depends(dependencies.get_db)):
+async def register(user: schemas_user.UserCreate, db: AsyncSession = Depends(dependencies.get_async_db)):
     """
-    Method used to register a new user
+    Method used to register a new user. The password is hashed inside the password hashing process pool.
 
     Args:
         user (schemas_user.UserCreate): Form data containing user information
-        db (Session, optional): Connector to the sqlite database. Defaults to Depends(dependencies.get_db).
+        db (AsyncSession, optional): Connector to the users database. Defaults to Depends(dependencies.get_async_db).
 
     Raises:
         HTTPException: If the user can't be created, a 400 HTTP response will be sent
@@ -29,53 +40,44 @@ def register(user: schemas_user.UserCreate, db: Session = Depends(dependencies.g
     Returns:
         dict: A dictionary containing the access_token and token_type
     """
-    if crud_user.get_user(db, user.username):
+    if await crud_user.get_user_async(db, user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
-    db_user = crud_user.create_user(
-        db, user.username, user.password)
+    hashed_password = await security.get_password_hash_async(user.password)
+    db_user = await crud_user.add_user_async(db, user.username, hashed_password)
     access_token = security.create_access_token(
         data={"username": db_user.username, "role": db_user.role})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/profile")
-def profile(token: str = Depends(oauth2_scheme),
-            db: Session = Depends(dependencies.get_db)):
+async def profile(current_user: dict = Depends(dependencies.get_current_user),
+                  db: AsyncSession = Depends(dependencies.get_async_db),
+                  mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db)):
     """
     Method is used to return the profile information of a certain user
 
     Args:
-        token (str, optional): The generated JWT token. Defaults to Depends(oauth2_scheme).
-        db (Session, optional): Connector to the sqlite database. Defaults to Depends(dependencies.get_db).
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        db (AsyncSession, optional): Connector to the users database. Defaults to Depends(dependencies.get_async_db).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
 
     Raises:
-        credentials_exception: If the token is invalid, a 401 HTTP response will be sent
         HTTPException: If the user is not found, a 404 HTTP response will be sent
 
     Returns:
         dict: The response contains user data, as well as the number of posts
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = security.decode_access_token(token)
-        username = payload.get("username")
-    except JWTError:
-        raise credentials_exception
-
-    user = crud_user.get_user(db, username)
+    username = current_user["username"]
+    user = await crud_user.get_user_async(db, username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    number_of_posts = posts_collection.count_documents({"author": username})
+    number_of_posts = await get_post_count(mongo_db, username)
 
     response = {
         "user": user.as_dict(exclude="hashed_password"),
@@ -84,132 +86,234 @@ def profile(token: str = Depends(oauth2_scheme),
     return response
 
 
-@router.get("/all_users")
-def get_users(token: str = Depends(oauth2_scheme),
-              db: Session = Depends(dependencies.get_db)):
+@router.get("/all_users", response_model=schemas_user.UserPage)
+async def get_users(limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+                    cursor: str | None = None,
+                    role: Annotated[str | None, Query(max_length=ROLE_MAX_LENGTH)] = None,
+                    prefix: Annotated[str | None, Query(max_length=USERNAME_MAX_LENGTH)] = None,
+                    current_user: dict = Depends(dependencies.get_current_user),
+                    db: AsyncSession = Depends(dependencies.get_async_db)):
     """
-    Method is used to get a list of all the users present in the database
+    Method is used to get a page of the users present in the database, ordered by id.
+    Pages are delimited by id, and only the id, username and role columns are read.
 
     Args:
-        token (str, optional): The generated JWT token. Defaults to Depends(oauth2_scheme).
-        db (Session, optional): Connector to the sqlite database. Defaults to Depends(dependencies.get_db).
+        limit (int, optional): Maximum number of users returned. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str | None, optional): The next_cursor received with the previous page. Defaults to None.
+        role (str | None, optional): Only return the users having this role. Defaults to None.
+        prefix (str | None, optional): Only return the users whose username starts with this prefix. Defaults to None.
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        db (AsyncSession, optional): Connector to the users database. Defaults to Depends(dependencies.get_async_db).
 
     Raises:
-        HTTPException: If the user role is not admin, a 403 HTTP response will be sent
-        credentials_exception: If the token is invalid, a 401 HTTP response will be sent
+        HTTPException: If the user role is not admin (403) or the cursor is malformed (400)
 
     Returns:
-        list: A list contianing all the users
-    """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = security.decode_access_token(token)
-        current_user_role = payload.get("role")
-        if current_user_role != "admin":
+        dict: The users of the page and the cursor of the next page (None if this is the last page)
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can list users",
+        )
+
+    after_id = None
+    if cursor:
+        try:
+            after_id = int(decode_cursor(cursor)["id"])
+        except (ValueError, KeyError, TypeError):
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only admins can change user roles",
-            )
-    except JWTError:
-        raise credentials_exception
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+    users = await crud_user.get_users_page_async(db, limit + 1, after_id, role, prefix)
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor({"id": users[-1]["id"]})
+    return {"users": users, "next_cursor": next_cursor}
+
+
+@router.put("/roles", response_model=schemas_user.UsersBatchResult)
+async def change_users_role(update: schemas_user.UsersRoleUpdate,
+                            current_user: dict = Depends(dependencies.get_current_user),
+                            db: AsyncSession = Depends(dependencies.get_async_db)):
+    """
+    Method is used to change the role of several users at once, with a single UPDATE inside a single transaction.
+    Unknown usernames are skipped and reported.
+
+    Args:
+        update (schemas_user.UsersRoleUpdate): The usernames whose role will be changed and the new role
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        db (AsyncSession, optional): Connector to the users database. Defaults to Depends(dependencies.get_async_db).
+
+    Raises:
+        HTTPException: If the user role is not admin, a 403 HTTP response will be sent
+
+    Returns:
+        dict: A success message, the usernames whose role was changed and the unknown usernames
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can change user roles",
+        )
+
+    requested = list(dict.fromkeys(update.usernames))
+    existing = await crud_user.get_existing_usernames_async(db, requested)
+    usernames = [username for username in requested if username in existing]
+    if usernames:
+        await crud_user.update_roles_async(db, usernames, update.role)
+    return {
+        "message": f"{len(usernames)} user(s) role changed to '{update.role}' successfully.",
+        "usernames": usernames,
+        "not_found": [username for username in requested if username not in existing],
+    }
 
-    users = crud_user.get_users(db)
-    users = [user.as_dict(exclude="hashed_password") for user in users]
-    return users
+
+@router.delete("", response_model=schemas_user.UsersBatchResult, status_code=status.HTTP_202_ACCEPTED)
+async def delete_users(batch: schemas_user.UsersDelete,
+                       current_user: dict = Depends(dependencies.get_current_user),
+                       db: AsyncSession = Depends(dependencies.get_async_db),
+                       mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db)):
+    """
+    Method is used to delete several users at once, with a single DELETE. Unknown usernames are skipped and reported.
+    Their posts are deleted in the background by a single job, whose progress is served by get_job.
+
+    Args:
+        batch (schemas_user.UsersDelete): The usernames of the users that will be deleted
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        db (AsyncSession, optional): Connector to the users database. Defaults to Depends(dependencies.get_async_db).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+
+    Raises:
+        HTTPException: If the user role is not admin, a 403 HTTP response will be sent
+
+    Returns:
+        dict: A success message, the deleted usernames, the unknown usernames and the id of the job deleting the posts
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can delete user accounts",
+        )
+
+    requested = list(dict.fromkeys(batch.usernames))
+    existing = await crud_user.get_existing_usernames_async(db, requested)
+    usernames = [username for username in requested if username in existing]
+    job_id = None
+    if usernames:
+        # The posts are only scheduled for deletion once the accounts are gone
+        await crud_user.delete_users_async(db, usernames)
+        job_id = await delete_users_posts(mongo_db, usernames)
+    return {
+        "message": f"{len(usernames)} user(s) deleted successfully.",
+        "usernames": usernames,
+        "not_found": [username for username in requested if username not in existing],
+        "job_id": job_id,
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=schemas_job.Job)
+async def get_job(job_id: str, current_user: dict = Depends(dependencies.get_current_user),
+                  mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db)):
+    """
+    Method is used to follow the progress of a background job, e.g. the deletion of the posts of deleted users
+
+    Args:
+        job_id (str): id of the job
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
+
+    Raises:
+        HTTPException: If the user role is not admin (403) or the job is not found (404)
+
+    Returns:
+        dict: The job status and progress
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can follow jobs",
+        )
+
+    job = await mongo_db[JOBS_COLLECTION].find_one({"_id": ObjectId(job_id)}) if ObjectId.is_valid(job_id) else None
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+    return {**job, "_id": str(job["_id"])}
 
 
 @router.put("/{username}/role")
-def change_user_role(username: str, new_role: schemas_user.UserRoleUpdate, token: str = Depends(oauth2_scheme),
-                     db: Session = Depends(dependencies.get_db)):
+async def change_user_role(username: str, new_role: schemas_user.UserRoleUpdate, current_user: dict = Depends(dependencies.get_current_user),
+                           db: AsyncSession = Depends(dependencies.get_async_db)):
     """
     Method is used to change the role of a certain user
 
     Args:
         username (str): username whose role will be changed
         new_role (schemas_user.UserRoleUpdate): The form data will contain the new role
-        token (str, optional): The generated JWT token. Defaults to Depends(oauth2_scheme).
-        db (Session, optional): Connector to the sqlite database. Defaults to Depends(dependencies.get_db).
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        db (AsyncSession, optional): Connector to the users database. Defaults to Depends(dependencies.get_async_db).
 
     Raises:
         HTTPException: If any error occurs, a certain HTTP error response will be sent
-        credentials_exception: If the token is invalid, a 401 HTTP response will be sent
 
     Returns:
         dict: A success message
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = security.decode_access_token(token)
-        current_user_role = payload.get("role")
-        if current_user_role != "admin":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only admins can change user roles",
-            )
-    except JWTError:
-        raise credentials_exception
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can change user roles",
+        )
 
-    user = crud_user.get_user(db, username)
+    user = await crud_user.get_user_async(db, username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    user.role = new_role.role
-    db.commit()
+    await crud_user.update_role_async(db, user, new_role.role)
     return {"message": f"User '{username}' role changed to '{new_role.role}' successfully."}
 
 
-@router.delete("/{username}")
-def delete_user(username: str, token: str = Depends(oauth2_scheme),
-                db: Session = Depends(dependencies.get_db)):
+@router.delete("/{username}", status_code=status.HTTP_202_ACCEPTED)
+async def delete_user(username: str, current_user: dict = Depends(dependencies.get_current_user),
+                      db: AsyncSession = Depends(dependencies.get_async_db),
+                      mongo_db: AsyncIOMotorDatabase = Depends(dependencies.get_mongo_db)):
     """
-    Method is used to delete a given user
+    Method is used to delete a given user. Its posts are deleted in the background by a job, whose progress
+    is served by get_job.
 
     Args:
         username (str): username of the user that will be deleted
-        token (str, optional): The generated JWT token. Defaults to Depends(oauth2_scheme).
-        db (Session, optional): Connector to the sqlite database. Defaults to Depends(dependencies.get_db).
+        current_user (dict, optional): The user making the request. Defaults to Depends(dependencies.get_current_user).
+        db (AsyncSession, optional): Connector to the users database. Defaults to Depends(dependencies.get_async_db).
+        mongo_db (AsyncIOMotorDatabase, optional): The forum database. Defaults to Depends(dependencies.get_mongo_db).
 
     Raises:
         HTTPException: If any error occurs, a certain HTTP error response will be sent
-        credentials_exception: If the token is invalid, a 401 HTTP response will be sent
 
     Returns:
-        dict: A success message
+        dict: A success message and the id of the job deleting the posts
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = security.decode_access_token(token)
-        current_user_role = payload.get("role")
-        if current_user_role != "admin":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only admins can delete user accounts",
-            )
-    except JWTError:
-        raise credentials_exception
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can delete user accounts",
+        )
 
-    user = crud_user.get_user(db, username)
+    user = await crud_user.get_user_async(db, username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    posts_collection.delete_many({"author": username})
-
-    crud_user.delete_user(db, user)
+    if not await crud_user.delete_user_async(db, user):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User could not be deleted"
+        )
+    job_id = await delete_users_posts(mongo_db, [username])
 
-    return {"message": f"User '{username}' deleted successfully."}
+    return {"message": f"User '{username}' deleted successfully.", "job_id": job_id}
@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+
+class Job(BaseModel):
+    id: str = Field(alias="_id")
+    type: str
+    status: str
+    usernames: List[str]
+    total_posts: int
+    deleted_posts: int
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
@@ -1,18 +1,45 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class Post(BaseModel):
-    id: Optional[str] = Field(alias="_id")
+    id: Optional[str] = Field(default=None, alias="_id")
     title: str
     content: str
     author: Optional[str] = None
     created_at: datetime | None  = None
     updated_at: Optional[datetime] = None
-    photo: Optional[str] = None
+    photo_id: Optional[str] = None
+    thumbnails: Optional[Dict[str, str]] = None
 
 class PostUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
     photo: Optional[str] = None
-    
\ No newline at end of file
+
+class PostPage(BaseModel):
+    posts: List[Post]
+    next_cursor: Optional[str] = None
+
+class PostSearchResult(BaseModel):
+    id: str = Field(alias="_id")
+    title: str
+    snippet: str
+    author: Optional[str] = None
+    created_at: datetime | None = None
+    score: float
+
+class PostSearchPage(BaseModel):
+    results: List[PostSearchResult]
+    next_cursor: Optional[str] = None
+
+class PostImportError(BaseModel):
+    line: int
+    error: str
+
+class PostImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[PostImportError]
+    elapsed_seconds: float
+    posts_per_second: float
@@ -1,14 +1,46 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from backend.app.models.user import ROLE_MAX_LENGTH, USERNAME_MAX_LENGTH
+
+# Maximum number of users changed by a single batch request
+USERS_BATCH_MAX_SIZE = 500
 
 
 class UserCreate(BaseModel):
-    username: str
+    username: str = Field(max_length=USERNAME_MAX_LENGTH)
     password: str
-    role: str = "user"
+    role: str = Field(default="user", max_length=ROLE_MAX_LENGTH)
 
 
 class UserRoleUpdate(BaseModel):
-    role: str
+    role: str = Field(max_length=ROLE_MAX_LENGTH)
+
+
+class UsersRoleUpdate(BaseModel):
+    usernames: List[str] = Field(min_length=1, max_length=USERS_BATCH_MAX_SIZE)
+    role: str = Field(max_length=ROLE_MAX_LENGTH)
+
+
+class UsersDelete(BaseModel):
+    usernames: List[str] = Field(min_length=1, max_length=USERS_BATCH_MAX_SIZE)
+
+
+class UsersBatchResult(BaseModel):
+    message: str
+    usernames: List[str]
+    not_found: List[str]
+    job_id: Optional[str] = None
+
+
+class UserSummary(BaseModel):
+    id: int
+    username: str
+    role: Optional[str]
+
+
+class UserPage(BaseModel):
+    users: List[UserSummary]
+    next_cursor: Optional[str] = None
 
 
 class Token(BaseModel):
@@ -0,0 +1,63 @@
+from pymongo import UpdateOne
+from backend.app.utils.mongodb import get_database
+
+# One document per author, {"_id": username, "post_count": n}, kept up to date by the forum writes
+POST_COUNTERS_COLLECTION = "author_stats"
+
+
+async def increment_post_count(db, author: str, amount: int = 1):
+    """
+    Atomically add the given amount to the post counter of an author, creating the counter if needed.
+    """
+    await db[POST_COUNTERS_COLLECTION].update_one(
+        {"_id": author}, {"$inc": {"post_count": amount}}, upsert=True)
+
+
+async def increment_post_counts(db, amounts: dict):
+    """
+    Same as increment_post_count for several authors at once, using a single bulk write.
+    """
+    if amounts:
+        await db[POST_COUNTERS_COLLECTION].bulk_write([
+            UpdateOne({"_id": author}, {"$inc": {"post_count": amount}}, upsert=True)
+            for author, amount in amounts.items()
+        ], ordered=False)
+
+
+async def get_post_count(db, author: str):
+    """
+    Return the number of posts of an author, read from its counter.
+    """
+    counter = await db[POST_COUNTERS_COLLECTION].find_one({"_id": author})
+    return counter["post_count"] if counter else 0
+
+
+async def delete_post_count(db, author: str):
+    """
+    Remove the counter of an author, used once all its posts are deleted.
+    """
+    await db[POST_COUNTERS_COLLECTION].delete_one({"_id": author})
+
+
+async def delete_empty_post_counts(db, authors: list):
+    """
+    Remove the counters of the given authors which dropped to zero. A counter still counting posts (e.g. of a user
+    registered again with the same username) is kept.
+    """
+    await db[POST_COUNTERS_COLLECTION].delete_many({"_id": {"$in": authors}, "post_count": {"$lte": 0}})
+
+
+def rebuild_post_counters(db):
+    """
+    Recompute all the post counters from the posts collection. The counters collection is replaced atomically.
+    Writes done while the aggregation runs may be lost, so this should run while the forum is quiet.
+    """
+    db["posts"].aggregate([
+        {"$group": {"_id": "$author", "post_count": {"$sum": 1}}},
+        {"$out": POST_COUNTERS_COLLECTION},
+    ])
+
+
+def main():
+    rebuild_post_counters(get_database())
+    print("Post counters rebuilt successfully.")
@@ -1,9 +1,53 @@
-from backend.app.utils.database import SessionLocal
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+from backend.app.utils import security
+from backend.app.utils.database import AsyncSessionLocal
+from backend.app.utils.mongodb import get_async_database
+from backend.app.utils.storage import get_blob_store as build_blob_store
 
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def get_mongo_db():
+    return get_async_database()
+
+
+async def get_blob_store():
+    return build_blob_store(get_async_database())
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    Method will decode the given token and will extract the information it holds (username, role).
+    Decoded tokens are cached until they expire, see security.decode_access_token_cached.
+
+    Args:
+        token (str, optional): The generated JWT token. Defaults to Depends(oauth2_scheme).
+
+    Raises:
+        HTTPException: If the token is invalid, a 401 HTTP response will be sent
+
+    Returns:
+        dict: The user data held by the token, in dictionary format
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = security.decode_access_token_cached(token)
+    except JWTError:
+        raise credentials_exception
+
+    username = payload.get("username")
+    role = payload.get("role")
+    if username is None or role is None:
+        raise credentials_exception
+    return {"username": username, "role": role}
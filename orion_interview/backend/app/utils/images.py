@@ -0,0 +1,140 @@
+import io
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError
+from backend.app.utils.storage import BlobStore
+from backend.app.utils.workers import WorkerPool
+
+# Uploaded photos are re-encoded to WebP, scaled down to fit PHOTO_MAX_SIZE x PHOTO_MAX_SIZE
+PHOTO_MAX_SIZE = int(os.getenv("PHOTO_MAX_SIZE", "2048"))
+PHOTO_QUALITY = int(os.getenv("PHOTO_QUALITY", "82"))
+# Largest photo accepted for ingestion, before being decoded
+PHOTO_MAX_UPLOAD_SIZE = int(os.getenv("PHOTO_MAX_UPLOAD_SIZE", str(20 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+PHOTO_FORMATS = ("JPEG", "PNG")
+PHOTO_CONTENT_TYPE = "image/webp"
+
+# Name and maximum width/height of the thumbnails generated for every post photo
+THUMBNAIL_SIZES = {
+    "small": 160,
+    "medium": 480,
+}
+THUMBNAIL_QUALITY = 80
+
+image_pool = WorkerPool(IMAGE_WORKERS)
+
+
+class InvalidPhoto(ValueError):
+    pass
+
+
+def open_photo(data: bytes):
+    """
+    Method will decode an uploaded photo, making sure it is a real JPEG or PNG image
+
+    Args:
+        data (bytes): The photo content
+
+    Raises:
+        InvalidPhoto: If the content is not a JPEG or PNG image, or is too large
+
+    Returns:
+        Image: The decoded photo, rotated according to its EXIF orientation
+    """
+    if len(data) > PHOTO_MAX_UPLOAD_SIZE:
+        raise InvalidPhoto("Photo is too large.")
+    try:
+        image = Image.open(io.BytesIO(data), formats=PHOTO_FORMATS)
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        raise InvalidPhoto("Photo must be a JPEG or PNG image.")
+    # exif_transpose applies the orientation to the pixels, the EXIF data itself is never written back
+    ImageOps.exif_transpose(image, in_place=True)
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def encode_webp(image: Image.Image, max_size: int, quality: int):
+    """
+    Scale an image down to fit max_size x max_size, keeping its aspect ratio, and encode it to WebP without metadata.
+    """
+    image = image.copy()
+    image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def render_thumbnails(image: Image.Image):
+    """
+    Return the WebP thumbnail of the given image for every size of THUMBNAIL_SIZES, keyed by size name.
+    """
+    return {name: encode_webp(image, max_size, THUMBNAIL_QUALITY) for name, max_size in THUMBNAIL_SIZES.items()}
+
+
+def process_photo(data: bytes, max_size: int, quality: int):
+    """
+    Method will validate an uploaded photo and build the stored version and the thumbnails. Runs inside image_pool.
+
+    Args:
+        data (bytes): The photo content
+        max_size (int): Maximum width/height of the stored version
+        quality (int): WebP quality of the stored version
+
+    Raises:
+        InvalidPhoto: If the content is not a JPEG or PNG image, or is too large
+
+    Returns:
+        tuple: The stored photo content and the thumbnails content, keyed by size name
+    """
+    image = open_photo(data)
+    return encode_webp(image, max_size, quality), render_thumbnails(image)
+
+
+def make_thumbnails(data: bytes):
+    """
+    Same as process_photo, for a photo stored before the ingestion existed: only the thumbnails are built.
+    Returns an empty dict if the photo can't be decoded.
+    """
+    try:
+        return render_thumbnails(open_photo(data))
+    except InvalidPhoto:
+        return {}
+
+
+async def save_photo(data: bytes, blob_store: BlobStore):
+    """
+    Method will process a photo inside the image worker pool and store it, with its thumbnails, inside the blob store
+
+    Args:
+        data (bytes): The photo content
+        blob_store (BlobStore): The store the photo will be saved into
+
+    Raises:
+        InvalidPhoto: If the content is not a JPEG or PNG image, or is too large
+
+    Returns:
+        dict: The "photo_id" and "thumbnails" fields of the post
+    """
+    # The settings are passed along, the worker processes don't share the module state of the backend
+    photo, thumbnails = await image_pool.run(process_photo, data, PHOTO_MAX_SIZE, PHOTO_QUALITY)
+    photo_id = await blob_store.put(photo, PHOTO_CONTENT_TYPE)
+    thumbnail_ids = {}
+    for name, thumbnail in thumbnails.items():
+        thumbnail_ids[name] = await blob_store.put(thumbnail, PHOTO_CONTENT_TYPE)
+    return {"photo_id": photo_id, "thumbnails": thumbnail_ids}
+
+
+async def delete_photo(post: dict, blob_store: BlobStore):
+    """
+    Delete the photo of a post and its thumbnails from the blob store.
+    """
+    for blob_id in photo_blob_ids(post):
+        await blob_store.delete(blob_id)
+
+
+def photo_blob_ids(post: dict):
+    """
+    Return the ids of all the blobs of a post photo: the original and its thumbnails.
+    """
+    blob_ids = [post["photo_id"]] if post.get("photo_id") else []
+    return blob_ids + list((post.get("thumbnails") or {}).values())
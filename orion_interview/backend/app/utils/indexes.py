@@ -0,0 +1,124 @@
+import sys
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from backend.app.utils.mongodb import get_database
+
+# Declarative list of the indexes of every forum collection. ensure_indexes() applies it, creating an
+# index that already exists with the same definition is a no-op, so it is safe to run on every startup.
+# A separate {author: 1} index is not needed, the (author, created_at) index serves author-only queries too.
+INDEXES = {
+    "posts": [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        IndexModel([("author", ASCENDING), ("created_at", DESCENDING)], name="author_created_at"),
+        # Used by the search, a match inside the title weighs more than one inside the content
+        IndexModel([("title", TEXT), ("content", TEXT)], name="title_content_text",
+                   weights={"title": 3, "content": 1}, default_language="english"),
+    ],
+    "jobs": [
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until"),
+    ],
+}
+
+# The queries run on every request (or on every user deletion), as explain commands.
+# check_indexes() fails if any of them is answered with a collection scan.
+HOT_QUERIES = {
+    "list posts": {
+        "find": "posts", "filter": {}, "sort": {"created_at": -1, "_id": -1}, "limit": 21,
+    },
+    "list posts after cursor": {
+        "find": "posts",
+        "filter": {"$or": [
+            {"created_at": {"$lt": datetime(2025, 1, 1)}},
+            {"created_at": datetime(2025, 1, 1), "_id": {"$lt": ObjectId("0" * 24)}},
+        ]},
+        "sort": {"created_at": -1, "_id": -1},
+        "limit": 21,
+    },
+    "search posts": {
+        "find": "posts",
+        "filter": {"$text": {"$search": "forum"}},
+        "projection": {"score": {"$meta": "textScore"}},
+        "sort": {"score": {"$meta": "textScore"}, "_id": -1},
+        "limit": 21,
+    },
+    "author post counter": {
+        "find": "author_stats", "filter": {"_id": "admin"},
+    },
+    "posts version": {
+        "find": "collection_versions", "filter": {"_id": "posts"},
+    },
+    "user posts batch": {
+        "find": "posts", "filter": {"author": {"$in": ["admin", "testuser"]}, "created_at": {"$lte": datetime(2025, 1, 1)}},
+        "projection": {"author": 1, "photo_id": 1, "thumbnails": 1}, "limit": 500,
+    },
+    "count user posts": {
+        "count": "posts", "query": {"author": {"$in": ["admin", "testuser"]}, "created_at": {"$lte": datetime(2025, 1, 1)}},
+    },
+    "claim job": {
+        "findAndModify": "jobs",
+        "query": {"status": {"$in": ["pending", "running"]}, "lease_until": {"$lte": datetime(2025, 1, 1)}},
+        "sort": {"lease_until": 1},
+        "update": {"$set": {"status": "running"}},
+    },
+}
+
+
+def ensure_indexes(db):
+    """
+    Create all the indexes of the registry inside the given database.
+    """
+    for collection, indexes in INDEXES.items():
+        db[collection].create_indexes(indexes)
+
+
+async def ensure_indexes_async(db):
+    """
+    Same as ensure_indexes, for a database of the async client.
+    """
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+
+def plan_stages(plan):
+    """
+    Generator returning the stage names of every node of an explain plan.
+    """
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+def find_collscans(db):
+    """
+    Method will explain every hot query and return the ones whose winning plan scans the whole collection
+
+    Args:
+        db (Database): The forum database
+
+    Returns:
+        list: The names of the queries doing a COLLSCAN
+    """
+    collscans = []
+    for name, command in HOT_QUERIES.items():
+        explain = db.command("explain", command, verbosity="queryPlanner")
+        if "COLLSCAN" in plan_stages(explain["queryPlanner"]["winningPlan"]):
+            collscans.append(name)
+    return collscans
+
+
+def check_indexes():
+    """
+    Entry point verifying that none of the hot queries of the forum database does a COLLSCAN.
+    """
+    collscans = find_collscans(get_database())
+    for name in collscans:
+        print(f"Query '{name}' does a COLLSCAN.")
+    if collscans:
+        sys.exit(1)
+    print("All hot queries are served by an index.")
@@ -1,11 +1,35 @@
+import argparse
+import asyncio
+import base64
+import io
+import logging
+import random
+import time
+from PIL import Image
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 from backend.app.utils.database import Base, engine
 from backend.app.models.user import User
 from backend.app.utils.security import get_password_hash
-from backend.app.utils.mongodb import client
+from backend.app.utils.counters import rebuild_post_counters
+from backend.app.utils.indexes import ensure_indexes
+from backend.app.utils.mongodb import client, get_async_database
+from backend.app.utils.response_cache import bump_posts_version
+from backend.app.utils.images import PHOTO_CONTENT_TYPE, InvalidPhoto, image_pool, make_thumbnails, save_photo
+from backend.app.utils.storage import BlobNotFound, detect_content_type, get_blob_store
 
-Base.metadata.create_all(bind=engine)
+SEED_USER_PREFIX = "seed_user_"
+SEED_PASSWORD = "password123"
+SEED_START = datetime(2024, 1, 1)
+SEED_BATCH_SIZE = 10000
+SEED_PHOTO_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f"]
+SEED_WORDS = [
+    "forum", "python", "mongo", "query", "index", "cursor", "photo", "profile", "admin", "latency",
+    "cache", "batch", "token", "stream", "worker", "thread", "async", "backend", "frontend", "deploy",
+]
+
+logger = logging.getLogger(__name__)
 
 
 def create_admin_user(session: Session):
@@ -43,6 +67,7 @@ def populate_mongodb():
     Populate MongoDB with a sample post.
     """
     db = client["forum"]
+    ensure_indexes(db)
     col = db["posts"]
 
     col.insert_one({
@@ -52,12 +77,208 @@ def populate_mongodb():
         "created_at": datetime.now(),
         "updated_at": None
     })
+    rebuild_post_counters(db)
     print("Sample post added to MongoDB.")
 
 
+async def migrate_inline_photos():
+    """
+    Move the base64 photos still stored inside post documents into the blob store, generating their thumbnails.
+    """
+    db = get_async_database()
+    blob_store = get_blob_store(db)
+    col = db["posts"]
+
+    migrated = 0
+    async for post in col.find({"photo": {"$exists": True}}, {"photo": 1}):
+        photo = {"photo_id": None, "thumbnails": None}
+        if post["photo"]:
+            try:
+                data = base64.b64decode(post["photo"])
+            except ValueError:
+                # binascii.Error (bad padding) is a ValueError too. The post keeps its photo, to be fixed by hand.
+                logger.warning("Post %s has a corrupt inline photo, left in place", post["_id"])
+                continue
+            try:
+                photo = await save_photo(data, blob_store)
+            except InvalidPhoto:
+                # Photos uploaded before the ingestion may not be valid images, they are moved as they are
+                photo = {"photo_id": await blob_store.put(data, detect_content_type(data)), "thumbnails": {}}
+        await col.update_one({"_id": post["_id"]},
+                             {"$set": photo, "$unset": {"photo": ""}})
+        migrated += 1
+    if migrated:
+        print(f"{migrated} post photos moved to the blob store.")
+
+
+async def generate_missing_thumbnails():
+    """
+    Generate the thumbnails of the post photos stored before thumbnails existed.
+    """
+    db = get_async_database()
+    blob_store = get_blob_store(db)
+    col = db["posts"]
+
+    generated = 0
+    async for post in col.find({"photo_id": {"$ne": None}, "thumbnails": None}, {"photo_id": 1}):
+        try:
+            blob, length, _ = await blob_store.open(post["photo_id"])
+        except BlobNotFound:
+            continue
+        try:
+            data = await blob.read(length)
+        finally:
+            blob.close()
+        thumbnails = {}
+        for name, thumbnail in make_thumbnails(data).items():
+            thumbnails[name] = await blob_store.put(thumbnail, PHOTO_CONTENT_TYPE)
+        await col.update_one({"_id": post["_id"]}, {"$set": {"thumbnails": thumbnails}})
+        generated += 1
+    if generated:
+        print(f"Thumbnails generated for {generated} post photos.")
+
+
+def seed_users(session: Session, count: int, batch_size: int = SEED_BATCH_SIZE):
+    """
+    Method will bulk insert synthetic users, all sharing the SEED_PASSWORD password.
+    The password is hashed once, and the users are numbered after the highest number seeded by previous runs,
+    so deleted seeded users or users named like them don't make a username collide.
+
+    Args:
+        session (Session): Connector to the sqlite database
+        count (int): The number of users to create
+        batch_size (int, optional): The number of users inserted by each statement. Defaults to SEED_BATCH_SIZE.
+    """
+    hashed_password = get_password_hash(SEED_PASSWORD)
+    suffixes = (username[len(SEED_USER_PREFIX):] for username in session.scalars(
+        select(User.username).where(User.username.startswith(SEED_USER_PREFIX))))
+    offset = max((int(suffix) + 1 for suffix in suffixes if suffix.isascii() and suffix.isdigit()), default=0)
+    for start in range(offset, offset + count, batch_size):
+        stop = min(start + batch_size, offset + count)
+        session.execute(insert(User), [
+            {"username": f"{SEED_USER_PREFIX}{index:07d}", "hashed_password": hashed_password, "role": "user"}
+            for index in range(start, stop)
+        ])
+        session.commit()
+    print(f"{count} users seeded.")
+
+
+def render_seed_photos():
+    """
+    Render the small PNG photos attached to the seeded posts, one per color of SEED_PHOTO_COLORS.
+    """
+    photos = []
+    for color in SEED_PHOTO_COLORS:
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), color).save(buffer, format="PNG")
+        photos.append(buffer.getvalue())
+    return photos
+
+
+def generate_posts(rng: random.Random, authors: list, count: int, photo_ratio: float):
+    """
+    Generator returning count synthetic posts, together with the index of their photo inside
+    render_seed_photos() (or None). The posts only depend on the state of rng, so a seed always
+    produces the same data. created_at grows with the index of the post, like on a real forum.
+
+    Args:
+        rng (random.Random): Seeded random generator
+        authors (list): Usernames the authors are picked from
+        count (int): The number of posts to generate
+        photo_ratio (float): Fraction of the posts having a photo
+
+    Returns:
+        tuple: The post document and the index of its photo
+    """
+    for index in range(count):
+        post = {
+            "title": " ".join(rng.choices(SEED_WORDS, k=rng.randint(2, 6))).capitalize(),
+            "content": " ".join(rng.choices(SEED_WORDS, k=rng.randint(10, 80))),
+            "author": rng.choice(authors),
+            "created_at": SEED_START + timedelta(seconds=index * 30 + rng.randrange(30)),
+            "updated_at": None,
+            "photo_id": None,
+            "thumbnails": None,
+        }
+        photo = rng.randrange(len(SEED_PHOTO_COLORS)) if rng.random() < photo_ratio else None
+        yield post, photo
+
+
+async def seed_posts(authors: list, count: int, photo_ratio: float, seed: int, batch_size: int = SEED_BATCH_SIZE):
+    """
+    Method will insert synthetic posts using batched unordered insert_many calls.
+    The photos of every batch are uploaded to the blob store concurrently before the batch is inserted.
+
+    Args:
+        authors (list): Usernames the authors are picked from
+        count (int): The number of posts to create
+        photo_ratio (float): Fraction of the posts having a photo
+        seed (int): Seed of the random generator
+        batch_size (int, optional): The number of posts inserted by each call. Defaults to SEED_BATCH_SIZE.
+    """
+    db = get_async_database()
+    blob_store = get_blob_store(db)
+    photos = render_seed_photos()
+    posts = generate_posts(random.Random(seed), authors, count, photo_ratio)
+
+    inserted = 0
+    started = time.perf_counter()
+    while inserted < count:
+        batch = [next(posts) for _ in range(min(batch_size, count - inserted))]
+        with_photo = [post for post, photo in batch if photo is not None]
+        photo_ids = await asyncio.gather(*(
+            blob_store.put(photos[photo], "image/png") for _, photo in batch if photo is not None))
+        for post, photo_id in zip(with_photo, photo_ids):
+            # The seeded photos are smaller than any thumbnail, they are shown as they are
+            post["photo_id"], post["thumbnails"] = photo_id, {}
+        await db["posts"].insert_many([post for post, _ in batch], ordered=False)
+        inserted += len(batch)
+        print(f"{inserted}/{count} posts seeded ({inserted / (time.perf_counter() - started):.0f} posts/s).")
+
+
+async def populate_blobs(authors: list, args: argparse.Namespace):
+    """
+    Run the steps writing to the blob store inside a single event loop, which the async client is bound to.
+    """
+    try:
+        await migrate_inline_photos()
+        await generate_missing_thumbnails()
+    finally:
+        image_pool.shutdown()
+    if args.posts:
+        await seed_posts(authors, args.posts, args.photo_ratio, args.seed, args.batch_size)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Initialize the databases, optionally with synthetic data.")
+    parser.add_argument("--users", type=int, default=0, help="number of synthetic users to create")
+    parser.add_argument("--posts", type=int, default=0, help="number of synthetic posts to create")
+    parser.add_argument("--photo-ratio", type=float, default=0.0, help="fraction of the synthetic posts with a photo")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE, help="number of rows written per batch")
+    args = parser.parse_args()
+    if not 0 <= args.photo_ratio <= 1:
+        parser.error("--photo-ratio must be between 0 and 1")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be positive")
+    return args
+
+
 def main():
+    args = parse_args()
+    Base.metadata.create_all(bind=engine)
     with Session(engine) as session:
         create_admin_user(session)
         create_testing_user(session)
+        if args.users:
+            seed_users(session, args.users, args.batch_size)
+        authors = session.scalars(select(User.username)).all()
 
     populate_mongodb()
+    asyncio.run(populate_blobs(authors, args))
+
+    if args.posts:
+        rebuild_post_counters(client["forum"])
+        print("Post counters rebuilt.")
+    # Running backends may have cached responses built before these writes
+    bump_posts_version(client["forum"])
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+from backend.app.utils.counters import delete_empty_post_counts, increment_post_counts
+from backend.app.utils.images import delete_photo
+from backend.app.utils.response_cache import response_cache
+from backend.app.utils.storage import BlobStore
+
+# Background jobs, e.g. {"_id": ObjectId, "type": "delete_posts", "usernames": [...], "status": "pending",
+# "total_posts": n, "deleted_posts": n, "attempts": n, "lease_until": datetime, "created_at": datetime, ...}
+JOBS_COLLECTION = "jobs"
+DELETE_POSTS_JOB = "delete_posts"
+
+# The posts of deleted users are removed DELETE_BATCH_SIZE at a time, pausing DELETE_BATCH_PAUSE seconds between batches
+DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "500"))
+DELETE_BATCH_PAUSE = float(os.getenv("DELETE_BATCH_PAUSE", "0.05"))
+# A running job is owned by its worker until its lease expires. The lease is renewed after every batch,
+# so the job of a crashed worker is taken over by another worker (or by the restarted backend) once it expires.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+def posts_filter(usernames: list, cutoff: datetime):
+    """
+    Return the filter of the posts deleted by a delete_posts job: the posts of the given users created up to cutoff.
+    """
+    return {"author": {"$in": usernames}, "created_at": {"$lte": cutoff}}
+
+
+async def create_delete_posts_job(db, usernames: list):
+    """
+    Method will create a job deleting all the posts of the given users, with their photos and counters. Only the
+    posts created before the job are deleted, so a user registered again with the same username keeps its new posts.
+
+    Args:
+        db (AsyncIOMotorDatabase): The forum database
+        usernames (list): The authors whose posts will be deleted
+
+    Returns:
+        str: The id of the job
+    """
+    now = datetime.now()
+    result = await db[JOBS_COLLECTION].insert_one({
+        "type": DELETE_POSTS_JOB,
+        "usernames": usernames,
+        "status": "pending",
+        "total_posts": await db["posts"].count_documents(posts_filter(usernames, now)),
+        "deleted_posts": 0,
+        "attempts": 0,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "finished_at": None,
+        "lease_until": now,
+    })
+    return str(result.inserted_id)
+
+
+async def claim_job(db):
+    """
+    Take the lease of the oldest job that is pending, or whose worker stopped renewing its lease. Returns None if
+    there is no such job.
+    """
+    now = datetime.now()
+    return await db[JOBS_COLLECTION].find_one_and_update(
+        {"status": {"$in": ["pending", "running"]}, "lease_until": {"$lte": now}},
+        {"$set": {"status": "running", "updated_at": now, "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS)},
+         "$inc": {"attempts": 1}},
+        sort=[("lease_until", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def delete_posts_batch(db, blob_store: BlobStore, usernames: list, cutoff: datetime, batch_size: int):
+    """
+    Method will delete up to batch_size posts of the given users created up to cutoff, with their photos.
+    The post counters are decremented by the number of deleted posts.
+
+    Args:
+        db (AsyncIOMotorDatabase): The forum database
+        blob_store (BlobStore): The store of the post photos
+        usernames (list): The authors whose posts are deleted
+        cutoff (datetime): Posts created after it are kept
+        batch_size (int): Maximum number of posts deleted
+
+    Returns:
+        int: The number of deleted posts, 0 once all the posts are deleted
+    """
+    posts = await db["posts"].find(posts_filter(usernames, cutoff),
+                                   {"author": 1, "photo_id": 1, "thumbnails": 1}).limit(batch_size).to_list(None)
+    if not posts:
+        return 0
+    # Deleting a missing blob is a no-op, so a batch interrupted after its photos were deleted can be run again
+    for post in posts:
+        await delete_photo(post, blob_store)
+    await db["posts"].delete_many({"_id": {"$in": [post["_id"] for post in posts]}})
+    await increment_post_counts(db, {author: -count for author, count in Counter(
+        post["author"] for post in posts).items()})
+    await response_cache.invalidate(db)
+    return len(posts)
+
+
+async def run_delete_posts_job(db, blob_store: BlobStore, job: dict):
+    """
+    Delete the posts of a delete_posts job batch by batch, recording the progress and renewing the lease after each one.
+    """
+    while deleted := await delete_posts_batch(db, blob_store, job["usernames"], job["created_at"], DELETE_BATCH_SIZE):
+        now = datetime.now()
+        await db[JOBS_COLLECTION].update_one({"_id": job["_id"]}, {
+            "$inc": {"deleted_posts": deleted},
+            "$set": {"updated_at": now, "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS)},
+        })
+        await asyncio.sleep(DELETE_BATCH_PAUSE)
+    await delete_empty_post_counts(db, job["usernames"])
+
+
+JOB_RUNNERS = {
+    DELETE_POSTS_JOB: run_delete_posts_job,
+}
+
+
+async def process_next_job(db, blob_store: BlobStore):
+    """
+    Method will claim the next available job and run it to completion. A failed job is retried once its lease
+    expires, until it has been attempted JOB_MAX_ATTEMPTS times.
+
+    Args:
+        db (AsyncIOMotorDatabase): The forum database
+        blob_store (BlobStore): The store of the post photos
+
+    Returns:
+        bool: True if a job was processed, False if there was none
+    """
+    job = await claim_job(db)
+    if job is None:
+        return False
+    try:
+        await JOB_RUNNERS[job["type"]](db, blob_store, job)
+    except Exception as e:
+        logger.exception("Job %s failed", job["_id"])
+        update = {"error": str(e), "updated_at": datetime.now()}
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            update.update(status="failed", finished_at=update["updated_at"])
+        await db[JOBS_COLLECTION].update_one({"_id": job["_id"]}, {"$set": update})
+        return True
+    now = datetime.now()
+    await db[JOBS_COLLECTION].update_one({"_id": job["_id"]}, {
+        "$set": {"status": "done", "error": None, "updated_at": now, "finished_at": now}})
+    return True
+
+
+class JobWorker:
+    """
+    Background task processing the jobs one at a time, started and stopped by the application lifespan.
+    It sleeps JOB_POLL_INTERVAL seconds when there is no job, or until notify() is called.
+    """
+
+    def __init__(self, poll_interval: float = JOB_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.task: asyncio.Task | None = None
+        self.wakeup: asyncio.Event | None = None
+
+    def start(self, db, blob_store: BlobStore):
+        # An event is bound to the loop which first awaits it, so every lifespan gets a new one
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run(db, blob_store, self.wakeup))
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+            self.wakeup = None
+
+    def notify(self):
+        """
+        Wake the worker up, called after a job is created.
+        """
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def run(self, db, blob_store: BlobStore, wakeup: asyncio.Event):
+        while True:
+            try:
+                if await process_next_job(db, blob_store):
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+            except Exception:
+                # e.g. the database is unreachable, the job will be claimed again once its lease expires
+                logger.exception("Job worker error")
+                await asyncio.sleep(self.poll_interval)
+
+
+job_worker = JobWorker()
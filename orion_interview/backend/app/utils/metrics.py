@@ -0,0 +1,178 @@
+import os
+import time
+from contextvars import ContextVar
+from anyio import to_thread
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from pymongo import monitoring
+from sqlalchemy import event
+
+# Label of the requests matching no route (404s), so random URLs can't create new time series
+UNMATCHED_ROUTE = "unmatched"
+# Label of the database commands sent outside of a request, e.g. by the job worker
+BACKGROUND_ROUTE = "background"
+
+# Database commands take a few milliseconds, the default buckets (5ms to 10s) are too coarse for them
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Latency of the HTTP requests, by route template", ["method", "route"])
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP responses, by route template and status code", ["method", "route", "status"])
+MONGODB_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "Duration of the MongoDB commands, by command name and route",
+    ["command", "route"], buckets=DB_BUCKETS)
+MONGODB_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands, by command name and route", ["command", "route"])
+SQL_QUERY_DURATION = Histogram(
+    "sql_query_duration_seconds", "Duration of the users database queries, by statement type and route",
+    ["operation", "route"], buckets=DB_BUCKETS)
+# With several worker processes, the gauges are summed over the live workers
+THREADPOOL_THREADS_BUSY = Gauge(
+    "threadpool_threads_busy", "Threads of the request threadpool running sync code (sync routes, run_in_threadpool)",
+    multiprocess_mode="livesum")
+THREADPOOL_THREADS_LIMIT = Gauge("threadpool_threads_limit", "Size of the request threadpool",
+                                 multiprocess_mode="livesum")
+THREADPOOL_TASKS_WAITING = Gauge("threadpool_tasks_waiting", "Tasks waiting for a free thread of the request threadpool",
+                                 multiprocess_mode="livesum")
+
+# ASGI scope of the request being served. The router stores the matched route inside it, so the database
+# commands sent by the route handler are labeled with the route. Motor copies the context into its executor threads.
+current_scope: ContextVar[dict | None] = ContextVar("current_scope", default=None)
+# Database calls of the request being served, as (database, command, seconds) tuples, set by the profiling middleware
+current_db_calls: ContextVar[list | None] = ContextVar("current_db_calls", default=None)
+
+
+def route_label(scope: dict):
+    """
+    Return the path template of the route matched by a request, e.g. /forum/posts/{id}.
+    """
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+def current_route():
+    """
+    Return the route label of the database commands sent from the current context.
+    """
+    scope = current_scope.get()
+    return route_label(scope) if scope is not None else BACKGROUND_ROUTE
+
+
+def record_db_call(database: str, command: str, seconds: float):
+    """
+    Add a database call to the calls of the current request, if they are being recorded.
+    """
+    calls = current_db_calls.get()
+    if calls is not None:
+        calls.append((database, command, seconds))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency and the status code of every HTTP request.
+    The latency of a streamed response includes the time spent streaming it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # Stays 500 if the handler raises before starting the response
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = current_scope.set(scope)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_label(scope)
+            HTTP_REQUEST_DURATION.labels(scope["method"], route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+            # Every worker keeps its gauges up to date, the scrape is served by only one of them
+            update_threadpool_metrics()
+            current_scope.reset(token)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    pymongo listener recording the duration of every MongoDB command. The events are published by the thread
+    which sent the command, inside the context of the request.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGODB_COMMAND_DURATION.labels(event.command_name, current_route()).observe(event.duration_micros / 1e6)
+        record_db_call("mongodb", event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        route = current_route()
+        MONGODB_COMMAND_DURATION.labels(event.command_name, route).observe(event.duration_micros / 1e6)
+        MONGODB_COMMAND_FAILURES.labels(event.command_name, route).inc()
+        record_db_call("mongodb", event.command_name, event.duration_micros / 1e6)
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    operation = statement.split(None, 1)[0].upper() if statement.strip() else ""
+    duration = time.perf_counter() - context.metrics_start
+    SQL_QUERY_DURATION.labels(operation, current_route()).observe(duration)
+    record_db_call("sql", operation, duration)
+
+
+def observe_queries(engine):
+    """
+    Record the duration of every query sent through a (sync) engine. For an async engine, pass its sync_engine.
+    """
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def update_threadpool_metrics():
+    """
+    Refresh the threadpool gauges. Must be called from the event loop, the threadpool limiter is bound to it.
+    """
+    limiter = to_thread.current_default_thread_limiter()
+    THREADPOOL_THREADS_BUSY.set(limiter.borrowed_tokens)
+    THREADPOOL_THREADS_LIMIT.set(limiter.total_tokens)
+    THREADPOOL_TASKS_WAITING.set(limiter.statistics().tasks_waiting)
+
+
+def generate_metrics():
+    """
+    Method will serialize the metrics in the Prometheus text format. When the backend runs several worker processes
+    (PROMETHEUS_MULTIPROC_DIR is set, see run_backend), the metrics of all the workers are aggregated.
+
+    Returns:
+        bytes: The metrics
+    """
+    update_threadpool_metrics()
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead():
+    """
+    Drop the live gauges of the current worker process, called when it stops.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,13 +1,44 @@
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 import os
+from backend.app.utils.metrics import mongo_command_metrics
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "forum")
 
 client = MongoClient(MONGO_URL)
+async_client: AsyncIOMotorClient | None = None
 
 def get_database():
     """
     Get a reference to the MongoDB forum database.
     """
     return client[MONGO_DB_NAME]
+
+
+def connect_async_client():
+    """
+    Create the async client shared by all the request handlers. It is opened and closed by the app lifespan.
+    """
+    global async_client
+    if async_client is None:
+        async_client = AsyncIOMotorClient(MONGO_URL, event_listeners=[mongo_command_metrics])
+    return async_client
+
+
+def close_async_client():
+    """
+    Close the shared async client.
+    """
+    global async_client
+    if async_client is not None:
+        async_client.close()
+        async_client = None
+
+
+def get_async_database():
+    """
+    Get a reference to the MongoDB forum database, through the shared async client.
+    """
+    return connect_async_client()[MONGO_DB_NAME]
+
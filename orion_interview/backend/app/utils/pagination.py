@@ -0,0 +1,48 @@
+import base64
+import binascii
+from bson import json_util
+from bson.errors import InvalidId
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(position: dict):
+    """
+    Method will encode the position of the last returned item into an opaque cursor token
+
+    Args:
+        position (dict): The sort key values of the last item in the page
+
+    Returns:
+        str: A URL safe cursor token
+    """
+    return base64.urlsafe_b64encode(json_util.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, expected: dict | None = None):
+    """
+    Method will decode a cursor token generated by encode_cursor
+
+    Args:
+        cursor (str): The cursor token received from the client
+        expected (dict | None, optional): The type (or tuple of types) of every key the cursor must hold,
+            e.g. {"created_at": datetime, "_id": ObjectId}. The values end up inside database filters,
+            so anything else (e.g. a query operator) is rejected. Defaults to None.
+
+    Raises:
+        ValueError: If the token is malformed, or misses an expected key or holds a value of another type
+
+    Returns:
+        dict: The sort key values of the last item in the previous page
+    """
+    try:
+        position = json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError, TypeError, InvalidId) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    for key, types in (expected or {}).items():
+        if not isinstance(position.get(key), types):
+            raise ValueError("Invalid cursor")
+    return position
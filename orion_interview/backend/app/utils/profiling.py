@@ -0,0 +1,121 @@
+import cProfile
+import hmac
+import logging
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from fastapi.concurrency import run_in_threadpool
+from backend.app.utils.metrics import current_db_calls, route_label
+
+# Fraction of the requests profiled with cProfile, 0 disables the sampling
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# A request sending this value inside PROFILE_HEADER is always profiled. Empty disables the header.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_HEADER = "X-Profile-Token"
+# Header of the response holding the id of its profile dump
+PROFILE_ID_HEADER = "X-Profile-Id"
+# The profile dumps (<id>.prof, to be opened with pstats or snakeviz) are written inside PROFILE_DIR,
+# only the latest PROFILE_MAX_DUMPS are kept
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_DUMPS = int(os.getenv("PROFILE_MAX_DUMPS", "100"))
+# Requests slower than SLOW_REQUEST_THRESHOLD seconds are logged with their database calls, 0 disables the log
+SLOW_REQUEST_THRESHOLD = float(os.getenv("SLOW_REQUEST_THRESHOLD", "1"))
+
+logger = logging.getLogger(__name__)
+
+
+def profile_requested(scope: dict):
+    """
+    Return True if the request must be profiled: it was sampled, or it sends PROFILE_TOKEN inside PROFILE_HEADER.
+    """
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return True
+    if not PROFILE_TOKEN:
+        return False
+    header = PROFILE_HEADER.lower().encode()
+    token = next((value for name, value in scope["headers"] if name == header), None)
+    return token is not None and hmac.compare_digest(token, PROFILE_TOKEN.encode())
+
+
+def save_profile(profiler: cProfile.Profile, profile_id: str):
+    """
+    Write a profile dump inside PROFILE_DIR, deleting the oldest dumps beyond PROFILE_MAX_DUMPS.
+    """
+    directory = Path(PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f"{profile_id}.prof")
+    # The ids start with their timestamp, so the names sort from the oldest to the latest dump
+    dumps = sorted(directory.glob("*.prof"))
+    for dump in dumps[:max(len(dumps) - PROFILE_MAX_DUMPS, 0)]:
+        dump.unlink(missing_ok=True)
+
+
+def summarize_db_calls(calls: list):
+    """
+    Group the database calls of a request by database and command, e.g. "mongodb find 2x 35.1ms".
+    """
+    totals: defaultdict[tuple[str, str], list] = defaultdict(lambda: [0, 0.0])
+    for database, command, seconds in calls:
+        totals[(database, command)][0] += 1
+        totals[(database, command)][1] += seconds
+    return ", ".join(f"{database} {command} {count}x {seconds * 1000:.1f}ms"
+                     for (database, command), (count, seconds) in totals.items())
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling the sampled requests and logging the slow ones with their database calls.
+    cProfile follows the event loop thread, so the profile of a request also holds the work done meanwhile
+    for the other requests, and not the code run inside the threadpool. Only one request is profiled at a time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.profiling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profiler, profile_id = None, None
+        if not self.profiling and profile_requested(scope):
+            self.profiling = True
+            profiler = cProfile.Profile()
+            profile_id = f"{datetime.now():%Y%m%dT%H%M%S.%f}-{uuid.uuid4().hex[:8]}"
+        status_code = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profiler is not None:
+                    message["headers"] = [*message.get("headers", []),
+                                          (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())]
+            await send(message)
+
+        calls = []
+        token = current_db_calls.set(calls)
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.profiling = False
+            duration = time.perf_counter() - start
+            current_db_calls.reset(token)
+            if profiler is not None:
+                await run_in_threadpool(save_profile, profiler, profile_id)
+            if 0 < SLOW_REQUEST_THRESHOLD <= duration:
+                db_time = sum(seconds for _, _, seconds in calls)
+                logger.warning(
+                    "Slow request: %s %s (route %s) %s in %.1fms, database %.1fms [%s]%s",
+                    scope["method"], scope["path"], route_label(scope), status_code, duration * 1000,
+                    db_time * 1000, summarize_db_calls(calls) or "no calls",
+                    f", profile {profile_id}" if profile_id else "")
@@ -0,0 +1,116 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from pymongo import ReturnDocument
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+# How long (in seconds) a process trusts the posts version it last read, before reading it again.
+# Writes done by this process are seen immediately, writes done by other processes after at most this long.
+RESPONSE_CACHE_VERSION_TTL = float(os.getenv("RESPONSE_CACHE_VERSION_TTL", "1"))
+
+# {"_id": "posts", "version": n}, incremented by every write to the posts collection
+VERSIONS_COLLECTION = "collection_versions"
+POSTS_VERSION_ID = "posts"
+
+
+def make_etag(body: bytes):
+    """
+    Strong ETag derived from the response body, so it changes with the content and not with the process serving it.
+    """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str):
+    """
+    Method will check if the If-None-Match header of a request matches the given ETag
+
+    Args:
+        if_none_match (str | None): The If-None-Match header of the request
+        etag (str): The current ETag of the resource
+
+    Returns:
+        bool: True if the client copy is still valid
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized post responses, tagged with the version of the posts collection they were built from.
+    An entry is only served while the version is unchanged, and every write to the posts increments the version,
+    so a write invalidates all the entries at once. The cache is only used from the event loop, it needs no lock.
+    """
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, version_ttl: float = RESPONSE_CACHE_VERSION_TTL):
+        self.max_size = max_size
+        self.version_ttl = version_ttl
+        self.entries: OrderedDict[tuple, tuple[int, str, bytes]] = OrderedDict()
+        self.version: int | None = None
+        self.version_read_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    async def get_version(self, db):
+        """
+        Return the current version of the posts collection. It is read from the database at most once per version_ttl.
+        """
+        now = time.monotonic()
+        if self.version is None or now - self.version_read_at >= self.version_ttl:
+            document = await db[VERSIONS_COLLECTION].find_one({"_id": POSTS_VERSION_ID})
+            self.version = document["version"] if document else 0
+            self.version_read_at = now
+        return self.version
+
+    async def invalidate(self, db):
+        """
+        Increment the version of the posts collection, must be awaited after every write to the posts.
+        """
+        document = await db[VERSIONS_COLLECTION].find_one_and_update(
+            {"_id": POSTS_VERSION_ID}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER)
+        self.version = document["version"]
+        self.version_read_at = time.monotonic()
+        self.entries.clear()
+
+    def get(self, key: tuple, version: int):
+        """
+        Return the (etag, body) cached for the given key and version, or None.
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, key: tuple, version: int, body: bytes):
+        """
+        Cache the body of a response built from the given version, and return its (etag, body).
+        """
+        etag = make_etag(body)
+        if self.max_size > 0:
+            self.entries[key] = (version, etag, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return etag, body
+
+    def clear(self):
+        self.entries.clear()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+
+def bump_posts_version(db):
+    """
+    Same as ResponseCache.invalidate, for scripts writing to the posts with the sync client.
+    """
+    db[VERSIONS_COLLECTION].update_one({"_id": POSTS_VERSION_ID}, {"$inc": {"version": 1}}, upsert=True)
+
+
+response_cache = ResponseCache()
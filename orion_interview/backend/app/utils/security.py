@@ -1,12 +1,81 @@
 import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
+from backend.app.utils.workers import WorkerPool
 
 # SECRET_KEY = os.urandom(32).hex()
 SECRET_KEY = "A_SECRET_KEY"
 ALGORITHM = "HS256"
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hashes using fewer rounds than BCRYPT_ROUNDS are reported as outdated and upgraded on the next login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__default_rounds=BCRYPT_ROUNDS, bcrypt__min_rounds=BCRYPT_ROUNDS)
+password_pool = WorkerPool(PASSWORD_HASH_WORKERS)
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of decoded access tokens. Entries are keyed by the SHA-256 digest of the token,
+    so the raw tokens are never kept in memory, and are dropped once the token expires.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str):
+        """
+        Return the cached payload of the token, or None if it is unknown or expired.
+        """
+        key = self._key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > time.time():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, payload: dict):
+        """
+        Cache the decoded payload of a token until its "exp" claim. Tokens without expiration are not cached.
+        """
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)) or self.max_size <= 0:
+            return
+        key = self._key(token)
+        with self.lock:
+            self.entries[key] = (expires_at, payload)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+token_cache = TokenCache()
 
 
 def get_password_hash(password: str):
@@ -17,6 +86,28 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    Verify a password and, if the stored hash uses outdated parameters, compute its replacement.
+    Returns a (verified, new_hash) tuple, new_hash is None when the stored hash is up to date.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str):
+    """
+    Same as get_password_hash, computed inside the password hashing process pool.
+    """
+    return await password_pool.run(get_password_hash, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str):
+    """
+    Same as verify_and_update_password, computed inside the password hashing process pool.
+    """
+    return await password_pool.run(verify_and_update_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.now() + (expires_delta or timedelta(minutes=15))
@@ -26,3 +117,15 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 def decode_access_token(token: str):
     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def decode_access_token_cached(token: str):
+    """
+    Same as decode_access_token, but the signature check and JSON parsing are skipped for tokens seen recently.
+    Raises JWTError for invalid tokens, which are never cached.
+    """
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = decode_access_token(token)
+        token_cache.put(token, payload)
+    return payload
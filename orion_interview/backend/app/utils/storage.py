@@ -0,0 +1,159 @@
+import os
+import uuid
+import mimetypes
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from fastapi.concurrency import run_in_threadpool
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+BLOB_STORE = os.getenv("BLOB_STORE", "gridfs")
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "./blobs")
+BLOB_BUCKET_NAME = os.getenv("BLOB_BUCKET_NAME", "photos")
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+class BlobStore:
+    """
+    Interface of the binary storage used for post photos.
+    Blobs are immutable: replacing a photo stores a new blob and deletes the old one.
+    """
+
+    async def put(self, data: bytes, content_type: str):
+        """
+        Store the given bytes and return the id of the new blob.
+        """
+        raise NotImplementedError
+
+    async def open(self, blob_id: str):
+        """
+        Return a (reader, length, content_type) tuple for the given blob.
+        The reader provides seek(offset), an awaitable read(size) and close(), and must be closed by the caller.
+        Raises BlobNotFound if the blob does not exist.
+        """
+        raise NotImplementedError
+
+    async def delete(self, blob_id: str):
+        """
+        Delete the given blob. Deleting a missing blob is a no-op.
+        """
+        raise NotImplementedError
+
+
+class GridFSBlobStore(BlobStore):
+    """
+    Blob store keeping the photos in a MongoDB GridFS bucket, next to the forum data.
+    """
+
+    def __init__(self, db, bucket_name: str = BLOB_BUCKET_NAME):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+
+    async def put(self, data: bytes, content_type: str):
+        blob_id = await self.bucket.upload_from_stream(
+            uuid.uuid4().hex, data, metadata={"content_type": content_type})
+        return str(blob_id)
+
+    async def open(self, blob_id: str):
+        try:
+            grid_out = await self.bucket.open_download_stream(ObjectId(blob_id))
+        except (InvalidId, NoFile):
+            raise BlobNotFound(blob_id)
+        metadata = grid_out.metadata or {}
+        return grid_out, grid_out.length, metadata.get("content_type", DEFAULT_CONTENT_TYPE)
+
+    async def delete(self, blob_id: str):
+        try:
+            await self.bucket.delete(ObjectId(blob_id))
+        except (InvalidId, NoFile):
+            pass
+
+
+class LocalBlobReader:
+    """
+    Async reader over a local file, the blocking reads are done in the threadpool.
+    """
+
+    def __init__(self, f):
+        self.f = f
+
+    def seek(self, offset: int):
+        self.f.seek(offset)
+
+    async def read(self, size: int = -1):
+        return await run_in_threadpool(self.f.read, size)
+
+    def close(self):
+        self.f.close()
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Blob store keeping the photos as files inside a local directory. Mostly useful for tests and local development.
+    """
+
+    def __init__(self, root: str = BLOB_STORE_PATH):
+        self.root = root
+
+    def _path(self, blob_id: str):
+        if not blob_id or os.path.basename(blob_id) != blob_id or blob_id.startswith("."):
+            raise BlobNotFound(blob_id)
+        return os.path.join(self.root, blob_id)
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(self.root, exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    async def put(self, data: bytes, content_type: str):
+        blob_id = uuid.uuid4().hex + (mimetypes.guess_extension(content_type) or "")
+        await run_in_threadpool(self._write, self._path(blob_id), data)
+        return blob_id
+
+    async def open(self, blob_id: str):
+        path = self._path(blob_id)
+        try:
+            f = await run_in_threadpool(open, path, "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(blob_id)
+        content_type = mimetypes.guess_type(path)[0] or DEFAULT_CONTENT_TYPE
+        return LocalBlobReader(f), os.fstat(f.fileno()).st_size, content_type
+
+    async def delete(self, blob_id: str):
+        try:
+            await run_in_threadpool(os.remove, self._path(blob_id))
+        except (BlobNotFound, FileNotFoundError):
+            pass
+
+
+def get_blob_store(db):
+    """
+    Build the blob store selected by the BLOB_STORE environment variable ("gridfs" or "local").
+
+    Args:
+        db (AsyncIOMotorDatabase): The forum database, used by the GridFS store
+    """
+    if BLOB_STORE == "local":
+        return LocalBlobStore(BLOB_STORE_PATH)
+    return GridFSBlobStore(db)
+
+
+def detect_content_type(data: bytes):
+    """
+    Method will detect the image type of the given bytes based on their signature
+
+    Args:
+        data (bytes): The photo content
+
+    Returns:
+        str: The MIME type of the photo
+    """
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    return DEFAULT_CONTENT_TYPE
@@ -0,0 +1,57 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi.concurrency import run_in_threadpool
+
+
+class WorkerPool:
+    """
+    Process pool running CPU bound work (password hashing, image processing) away from the
+    request threadpool, so a burst of such work can't starve the other endpoints.
+    The processes are started on first use. With max_workers <= 0 the work runs in the threadpool instead.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # "spawn" avoids forking a process that already runs the event loop and driver threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            # Another call may already have replaced the broken pool
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) inside the pool and return its result. fn and its arguments must be picklable.
+        If a worker process died (killed when out of memory, crashed), the pool is replaced and the call retried once.
+        """
+        if self.max_workers <= 0:
+            return await run_in_threadpool(fn, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(executor, call)
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            return await loop.run_in_executor(self._get_executor(), call)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
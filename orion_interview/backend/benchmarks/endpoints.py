@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import json
+import math
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockDatabase
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+from backend.app.main import app
+from backend.app.models.user import Base, User
+from backend.app.utils import dependencies, security
+from backend.app.utils.database import build_async_engine, build_engine
+from backend.app.utils.storage import LocalBlobStore
+
+DEFAULT_ITERATIONS = 50
+# Users changed or deleted by every request of the batch endpoints (PUT /users/roles, DELETE /users)
+BATCH_SIZE = 10
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(samples: list, rank: int):
+    """
+    Nearest-rank percentile of an already sorted list of samples.
+    """
+    index = max(math.ceil(rank / 100 * len(samples)) - 1, 0)
+    return samples[index]
+
+
+def summarize(samples: list, errors: int):
+    """
+    Method will build the statistics of a benchmarked endpoint
+
+    Args:
+        samples (list): The latency of every request, in seconds
+        errors (int): The number of requests answered with an unexpected status code
+
+    Returns:
+        dict: The request count, the latency percentiles in milliseconds and the throughput in requests per second
+    """
+    samples = sorted(samples)
+    total = sum(samples)
+    stats: dict[str, float | None] = {"requests": len(samples), "errors": errors}
+    for rank in PERCENTILES:
+        stats[f"p{rank}_ms"] = round(percentile(samples, rank) * 1000, 3)
+    stats["mean_ms"] = round(total / len(samples) * 1000, 3)
+    stats["throughput_rps"] = round(len(samples) / total, 2) if total else None
+    return stats
+
+
+class EndpointBenchmark:
+    """
+    Runs the backend application through TestClient against a SQLite database and a blob store inside
+    a temporary directory, and an in-memory Mongo stand-in (mongomock-motor).
+    The application lifespan is not started, so no real MongoDB is needed.
+    """
+
+    def __init__(self, iterations: int):
+        self.iterations = iterations
+        self.results: dict[str, dict] = {}
+        self.data_dir = tempfile.TemporaryDirectory()
+
+        # The tables are created with the sync engine, the application uses the async one, like with init_db
+        database_url = f"sqlite:///{self.data_dir.name}/users.db"
+        self.engine = build_engine(database_url)
+        Base.metadata.create_all(bind=self.engine)
+        self.async_engine = build_async_engine(database_url)
+        self.async_session_local = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        self.mongo_db: AsyncMongoMockDatabase = AsyncMongoMockClient()["forum_benchmark"]
+        self.blob_store = LocalBlobStore(f"{self.data_dir.name}/blobs")
+
+        app.dependency_overrides[dependencies.get_async_db] = self.get_async_db
+        app.dependency_overrides[dependencies.get_mongo_db] = self.get_mongo_db
+        app.dependency_overrides[dependencies.get_blob_store] = self.get_blob_store
+        self.client = TestClient(app)
+
+    async def get_async_db(self):
+        async with self.async_session_local() as db:
+            yield db
+
+    async def get_mongo_db(self):
+        return self.mongo_db
+
+    async def get_blob_store(self):
+        return self.blob_store
+
+    def close(self):
+        app.dependency_overrides.clear()
+        security.password_pool.shutdown()
+        asyncio.run(self.async_engine.dispose())
+        self.engine.dispose()
+        self.data_dir.cleanup()
+
+    def measure(self, name: str, requests, expected_status: int = 200):
+        """
+        Method will send every request of the given iterable and record its latency under the given name
+
+        Args:
+            name (str): The name of the benchmarked endpoint
+            requests (iterable): Callables sending one request through the client and returning the response
+            expected_status (int, optional): The status code of a successful request. Defaults to 200.
+
+        Returns:
+            list: The responses of the requests
+        """
+        samples, errors, responses = [], 0, []
+        for request in requests:
+            start = time.perf_counter()
+            response = request()
+            samples.append(time.perf_counter() - start)
+            if response.status_code != expected_status:
+                errors += 1
+            responses.append(response)
+        self.results[name] = summarize(samples, errors)
+        return responses
+
+    def seed_admin(self):
+        with Session(self.engine) as db:
+            db.add(User(username="admin", hashed_password=security.get_password_hash("admin"), role="admin"))
+            db.commit()
+        token = security.create_access_token(data={"username": "admin", "role": "admin"})
+        return {"Authorization": f"Bearer {token}"}
+
+    def seed_users(self, usernames: list):
+        # Inserted directly with a single hash, registering them would benchmark bcrypt once more
+        hashed_password = security.get_password_hash("password123")
+        with Session(self.engine) as db:
+            db.add_all([User(username=username, hashed_password=hashed_password, role="user")
+                        for username in usernames])
+            db.commit()
+
+    def run(self):
+        """
+        Method will benchmark every endpoint in turn. The scenarios build on each other: the registered users
+        are the ones logging in, creating posts and finally being deleted. The batch endpoints change and delete
+        users seeded in batches of BATCH_SIZE.
+
+        Returns:
+            dict: The statistics of every endpoint, keyed by endpoint name
+        """
+        client, iterations = self.client, self.iterations
+        admin = self.seed_admin()
+        usernames = [f"user{index}" for index in range(iterations)]
+        batches = [[f"batch{index}_{number}" for number in range(BATCH_SIZE)] for index in range(iterations)]
+        self.seed_users([username for batch in batches for username in batch])
+
+        responses = self.measure("register", (
+            lambda username=username: client.post(
+                "/users/register", json={"username": username, "password": "password123"})
+            for username in usernames))
+        users = [{"Authorization": f"Bearer {response.json()['access_token']}"} for response in responses]
+
+        self.measure("login", (
+            lambda username=username: client.post(
+                "/auth/login", data={"username": username, "password": "password123"})
+            for username in usernames))
+
+        self.measure("create_post", (
+            lambda headers=headers, index=index: client.post(
+                "/forum/posts", json={"title": f"Post {index}", "content": "Benchmark content " * 20},
+                headers=headers)
+            for index, headers in enumerate(users)))
+
+        self.measure("list_posts", (
+            lambda headers=headers: client.get("/forum/posts", headers=headers) for headers in users))
+
+        post_ids = []
+        cursor = None
+        while True:
+            page = client.get("/forum/posts", params={"cursor": cursor} if cursor else None, headers=admin).json()
+            post_ids += [post["_id"] for post in page["posts"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        self.measure("get_post", (
+            lambda post_id=post_id: client.get(f"/forum/posts/{post_id}", headers=admin) for post_id in post_ids))
+
+        self.measure("update_post", (
+            lambda post_id=post_id: client.put(
+                f"/forum/posts/{post_id}", json={"title": "Updated", "content": "Updated content"}, headers=admin)
+            for post_id in post_ids))
+
+        self.measure("profile", (
+            lambda headers=headers: client.get("/users/profile", headers=headers) for headers in users))
+
+        self.measure("all_users", (
+            lambda: client.get("/users/all_users", headers=admin) for _ in range(iterations)))
+
+        self.measure("change_user_role", (
+            lambda username=username: client.put(
+                f"/users/{username}/role", json={"role": "user"}, headers=admin)
+            for username in usernames))
+
+        self.measure("change_users_role", (
+            lambda batch=batch: client.put("/users/roles", json={"usernames": batch, "role": "user"}, headers=admin)
+            for batch in batches))
+
+        self.measure("delete_post", (
+            lambda post_id=post_id: client.delete(f"/forum/posts/{post_id}", headers=admin) for post_id in post_ids))
+
+        self.measure("delete_user", (
+            lambda username=username: client.delete(f"/users/{username}", headers=admin) for username in usernames),
+            expected_status=202)
+
+        self.measure("delete_users", (
+            lambda batch=batch: client.request("DELETE", "/users", json={"usernames": batch}, headers=admin)
+            for batch in batches), expected_status=202)
+
+        return self.results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(iterations: int = DEFAULT_ITERATIONS):
+    """
+    Method will run the endpoint benchmarks and build the report
+
+    Args:
+        iterations (int, optional): The number of requests sent to every endpoint. Defaults to DEFAULT_ITERATIONS.
+
+    Returns:
+        dict: The report, containing the run metadata and the statistics of every endpoint
+    """
+    benchmark = EndpointBenchmark(iterations)
+    try:
+        results = benchmark.run()
+    finally:
+        benchmark.close()
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "iterations": iterations,
+        "bcrypt_rounds": security.BCRYPT_ROUNDS,
+        "endpoints": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend endpoints and print the results as JSON.")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS,
+                        help="number of requests sent to every endpoint")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run_benchmarks(args.iterations), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,59 @@
+import argparse
+import os
+from pathlib import Path
 import uvicorn
 
+# Settings of the production mode (run-backend --production)
+BACKEND_HOST = os.getenv("BACKEND_HOST", "0.0.0.0")
+BACKEND_PORT = int(os.getenv("BACKEND_PORT", "8000"))
+# Worker processes, 0 starts one per available core
+BACKEND_WORKERS = int(os.getenv("BACKEND_WORKERS", "0"))
+# Seconds an idle keep-alive connection stays open, and connections queued by the OS until a worker accepts them
+BACKEND_KEEP_ALIVE = int(os.getenv("BACKEND_KEEP_ALIVE", "5"))
+BACKEND_BACKLOG = int(os.getenv("BACKEND_BACKLOG", "2048"))
+# Seconds a stopping worker (shutdown, or restart on SIGHUP) waits for its in-flight requests
+BACKEND_GRACEFUL_TIMEOUT = int(os.getenv("BACKEND_GRACEFUL_TIMEOUT", "30"))
+
+
+def available_cores():
+    """
+    Return the number of cores the backend may run on, which can be fewer than the cores of the box (CPU affinity).
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def prepare_metrics_dir():
+    """
+    Make the worker processes share their Prometheus metrics through PROMETHEUS_MULTIPROC_DIR (defaults to
+    ./metrics), emptied of the metrics of the previous run. Must be called before the workers are started.
+    """
+    directory = Path(os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.abspath("metrics")))
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob("*.db"):
+        path.unlink()
+
+
 def main():
-    uvicorn.run("backend.app.main:app", host="0.0.0.0", port=8000, reload=True)
+    parser = argparse.ArgumentParser(description="Run the backend.")
+    parser.add_argument("--production", action="store_true",
+                        help="Run several worker processes without the reloader, configured by the BACKEND_* "
+                             "environment variables.")
+    parser.add_argument("--workers", type=int, default=BACKEND_WORKERS,
+                        help="Number of worker processes of the production mode, 0 for one per available core.")
+    args = parser.parse_args()
+
+    if not args.production:
+        uvicorn.run("backend.app.main:app", host="0.0.0.0", port=8000, reload=True)
+        return
+
+    workers = args.workers or available_cores()
+    if workers > 1:
+        prepare_metrics_dir()
+    # uvloop and httptools are used when they are installed (uvicorn[standard]), asyncio and h11 otherwise.
+    # The workers are supervised by uvicorn: a dead worker is replaced, SIGHUP restarts them one at a time.
+    uvicorn.run("backend.app.main:app", host=BACKEND_HOST, port=BACKEND_PORT, workers=workers, reload=False,
+                loop="auto", http="auto", backlog=BACKEND_BACKLOG, timeout_keep_alive=BACKEND_KEEP_ALIVE,
+                timeout_graceful_shutdown=BACKEND_GRACEFUL_TIMEOUT)
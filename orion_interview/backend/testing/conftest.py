@@ -1,4 +1,10 @@
 import sys
+import pytest
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -1,86 +1,143 @@
+import time
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from passlib.hash import bcrypt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from backend.app.models.user import Base, User
-from backend.app.utils.security import get_password_hash
+from backend.app.utils.database import build_async_engine, build_engine
+from backend.app.utils.security import (
+    BCRYPT_ROUNDS, TokenCache, create_access_token, get_password_hash, token_cache)
+from backend.app.utils.dependencies import get_current_user
 from backend.app.routers.auth import login
 from backend.app.routers.users import register
 from backend.app.schemas.user import UserCreate
 
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={
-                       "check_same_thread": False})
-TestingSessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine)
-
-
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@pytest.fixture(scope="function")
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'users.db'}"
 
 
 @pytest.fixture(scope="function", autouse=True)
-def setup_database():
+def setup_database(database_url):
+    engine = build_engine(database_url)
     Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    hashed_password = get_password_hash("password123")
-    db.add(User(username="testuser", hashed_password=hashed_password, role="user"))
-    db.commit()
-    db.close()
-    yield
-    Base.metadata.drop_all(bind=engine)
+    with Session(engine) as db:
+        hashed_password = get_password_hash("password123")
+        db.add(User(username="testuser", hashed_password=hashed_password, role="user"))
+        db.commit()
+    engine.dispose()
+
 
+@pytest.fixture(scope="function")
+async def db(database_url):
+    engine = build_async_engine(database_url)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
 
-def test_login_success():
+
+@pytest.mark.anyio
+async def test_login_success(db):
     form_data = OAuth2PasswordRequestForm(
         username="testuser", password="password123")
-    db = next(override_get_db())
-    response = login(form_data=form_data, db=db)
+    response = await login(form_data=form_data, db=db)
     assert "access_token" in response
     assert response["token_type"] == "bearer"
 
 
-def test_login_invalid_password():
+@pytest.mark.anyio
+async def test_login_invalid_password(db):
     form_data = OAuth2PasswordRequestForm(
         username="testuser", password="wrongpassword")
-    db = next(override_get_db())
     with pytest.raises(Exception) as error:
-        login(form_data=form_data, db=db)
+        await login(form_data=form_data, db=db)
     assert error.value.status_code == 401
     assert error.value.detail == "Invalid username or password"
 
 
-def test_login_nonexistent_user():
+@pytest.mark.anyio
+async def test_login_nonexistent_user(db):
     form_data = OAuth2PasswordRequestForm(
         username="nonexistentuser", password="password123")
-    db = next(override_get_db())
     with pytest.raises(Exception) as error:
-        login(form_data=form_data, db=db)
+        await login(form_data=form_data, db=db)
     assert error.value.status_code == 401
     assert error.value.detail == "Invalid username or password"
 
 
-def test_register_success():
-    db = next(override_get_db())
+@pytest.mark.anyio
+async def test_register_success(db):
     new_user = UserCreate(username="newuser", password="password123")
-    response = register(user=new_user, db=db)
+    response = await register(user=new_user, db=db)
 
     assert "access_token" in response
     assert response["token_type"] == "bearer"
 
 
-def test_register_duplicate_user():
-    db = next(override_get_db())
+@pytest.mark.anyio
+async def test_register_duplicate_user(db):
     duplicate_user = UserCreate(username="testuser", password="password123")
 
     with pytest.raises(HTTPException) as error:
-        register(user=duplicate_user, db=db)
+        await register(user=duplicate_user, db=db)
 
     assert error.value.status_code == 400
     assert error.value.detail == "Username already registered"
+
+
+@pytest.mark.anyio
+async def test_login_upgrades_outdated_password_hash(db):
+    user = await db.scalar(select(User).where(User.username == "testuser"))
+    user.hashed_password = bcrypt.using(rounds=4).hash("password123")
+    await db.commit()
+
+    form_data = OAuth2PasswordRequestForm(
+        username="testuser", password="password123")
+    await login(form_data=form_data, db=db)
+
+    await db.refresh(user)
+    assert bcrypt.from_string(user.hashed_password).rounds == BCRYPT_ROUNDS
+    assert bcrypt.verify("password123", user.hashed_password)
+
+
+def test_token_cache_hits_and_misses():
+    cache = TokenCache(max_size=10)
+    payload = {"username": "testuser", "role": "user", "exp": time.time() + 60}
+
+    assert cache.get("token") is None
+    cache.put("token", payload)
+    assert cache.get("token") == payload
+
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_token_cache_evicts_expired_and_least_recently_used():
+    cache = TokenCache(max_size=2)
+    cache.put("expired", {"exp": time.time() - 1})
+    assert cache.get("expired") is None
+
+    for token in ["first", "second", "third"]:
+        cache.put(token, {"exp": time.time() + 60})
+    assert cache.get("first") is None
+    assert cache.get("third") is not None
+    assert len(cache.entries) == 2
+
+
+@pytest.mark.anyio
+async def test_get_current_user_uses_token_cache():
+    token_cache.clear()
+    token = create_access_token(data={"username": "testuser", "role": "user"})
+
+    assert await get_current_user(token) == {"username": "testuser", "role": "user"}
+    assert await get_current_user(token) == {"username": "testuser", "role": "user"}
+    assert token_cache.misses == 1
+    assert token_cache.hits == 1
+
+    with pytest.raises(HTTPException) as error:
+        await get_current_user("invalid-token")
+    assert error.value.status_code == 401
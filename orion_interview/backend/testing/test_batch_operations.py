@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import os
+import pytest
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+from backend.app.models.user import Base, User
+from backend.app.routers import forum, users
+from backend.app.schemas.post import PostUpdate
+from backend.app.schemas.user import UserPage, UsersDelete, UsersRoleUpdate
+from backend.app.utils.counters import get_post_count
+from backend.app.utils import jobs
+from backend.app.utils.database import build_async_engine, build_engine
+from backend.app.utils.response_cache import VERSIONS_COLLECTION, response_cache
+from backend.app.utils.storage import LocalBlobStore
+
+pytestmark = pytest.mark.anyio
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+TEST_DB_NAME = "forum_test"
+ADMIN = {"username": "admin", "role": "admin"}
+
+
+@pytest.fixture(scope="function")
+async def db(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'users.db'}"
+    engine = build_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        session.add(User(username="admin", hashed_password="hash", role="admin"))
+        for index in range(3):
+            session.add(User(username=f"user{index}", hashed_password="hash", role="user"))
+        session.commit()
+    engine.dispose()
+
+    async_engine = build_async_engine(database_url)
+    async with async_sessionmaker(async_engine, expire_on_commit=False)() as session:
+        yield session
+    await async_engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def mongo_db():
+    client = AsyncIOMotorClient(MONGO_URL)
+    test_db = client[TEST_DB_NAME]
+    await test_db["posts"].delete_many({})
+    await test_db["author_stats"].delete_many({})
+    await test_db[VERSIONS_COLLECTION].delete_many({})
+    await test_db[jobs.JOBS_COLLECTION].delete_many({})
+    response_cache.clear()
+
+    yield test_db
+
+    await test_db["posts"].delete_many({})
+    await test_db["author_stats"].delete_many({})
+    await test_db[VERSIONS_COLLECTION].delete_many({})
+    await test_db[jobs.JOBS_COLLECTION].delete_many({})
+    response_cache.clear()
+    client.close()
+
+
+async def roles(db):
+    db.expire_all()
+    return dict((await db.execute(select(User.username, User.role))).all())
+
+
+async def test_admin_changes_roles_in_batch(db):
+    response = await users.change_users_role(
+        update=UsersRoleUpdate(usernames=["user0", "user2", "user0", "ghost"], role="admin"),
+        current_user=ADMIN, db=db)
+
+    assert response["usernames"] == ["user0", "user2"]
+    assert response["not_found"] == ["ghost"]
+    assert await roles(db) == {"admin": "admin", "user0": "admin", "user1": "user", "user2": "admin"}
+
+    with pytest.raises(Exception) as error:
+        await users.change_users_role(update=UsersRoleUpdate(usernames=["user1"], role="admin"),
+                                      current_user={"username": "user0", "role": "user"}, db=db)
+    assert error.value.status_code == 403
+
+
+async def run_jobs(mongo_db, blob_store):
+    while await jobs.process_next_job(mongo_db, blob_store):
+        pass
+
+
+async def test_admin_deletes_users_and_their_posts_in_batch(db, mongo_db, tmp_path):
+    blob_store = LocalBlobStore(str(tmp_path / "blobs"))
+    for username in ["user0", "user1", "user2"]:
+        await forum.create_post(post=PostUpdate(title="Title", content="Content"),
+                                current_user={"username": username, "role": "user"},
+                                mongo_db=mongo_db, blob_store=blob_store)
+
+    response = await users.delete_users(batch=UsersDelete(usernames=["user0", "user1", "ghost"]),
+                                        current_user=ADMIN, db=db, mongo_db=mongo_db)
+
+    assert response["usernames"] == ["user0", "user1"]
+    assert response["not_found"] == ["ghost"]
+    assert set(await roles(db)) == {"admin", "user2"}
+
+    # The posts are deleted in the background
+    assert await mongo_db["posts"].count_documents({}) == 3
+    await run_jobs(mongo_db, blob_store)
+    job = await users.get_job(job_id=response["job_id"], current_user=ADMIN, mongo_db=mongo_db)
+    assert (job["status"], job["total_posts"], job["deleted_posts"]) == ("done", 2, 2)
+    assert [post["author"] async for post in mongo_db["posts"].find()] == ["user2"]
+    assert await get_post_count(mongo_db, "user0") == 0
+    assert await get_post_count(mongo_db, "user2") == 1
+
+
+async def test_failed_user_deletion_keeps_the_posts(db, mongo_db, tmp_path, monkeypatch):
+    blob_store = LocalBlobStore(str(tmp_path / "blobs"))
+    await forum.create_post(post=PostUpdate(title="Title", content="Content"),
+                            current_user={"username": "user0", "role": "user"},
+                            mongo_db=mongo_db, blob_store=blob_store)
+
+    async def fail_delete(db, user):
+        return False
+
+    monkeypatch.setattr(users.crud_user, "delete_user_async", fail_delete)
+    with pytest.raises(Exception) as error:
+        await users.delete_user(username="user0", current_user=ADMIN, db=db, mongo_db=mongo_db)
+
+    assert error.value.status_code == 500
+    assert await mongo_db[jobs.JOBS_COLLECTION].count_documents({}) == 0
+    assert "user0" in await roles(db)
+
+
+async def test_failed_user_deletion_is_logged_and_rolled_back(db, monkeypatch, caplog):
+    async def failing_commit():
+        raise RuntimeError("database is locked")
+
+    user = await users.crud_user.get_user_async(db, "user0")
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with caplog.at_level(logging.ERROR, logger=users.crud_user.__name__):
+        assert not await users.crud_user.delete_user_async(db, user)
+
+    assert caplog.records[-1].getMessage() == "Failed to delete user user0"
+    monkeypatch.undo()
+    assert "user0" in await roles(db)
+
+
+async def test_delete_posts_job_is_chunked_and_resumable(mongo_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "DELETE_BATCH_SIZE", 2)
+    monkeypatch.setattr(jobs, "DELETE_BATCH_PAUSE", 0)
+    blob_store = LocalBlobStore(str(tmp_path / "blobs"))
+    for index in range(5):
+        await forum.create_post(post=PostUpdate(title=f"Post {index}", content="Content"),
+                                current_user={"username": "user0", "role": "user"},
+                                mongo_db=mongo_db, blob_store=blob_store)
+    job_id = await jobs.create_delete_posts_job(mongo_db, ["user0"])
+
+    # A worker claims the job, deletes one batch and crashes: the job stays leased until its lease expires
+    job = await jobs.claim_job(mongo_db)
+    assert await jobs.delete_posts_batch(mongo_db, blob_store, job["usernames"], job["created_at"], 2) == 2
+    assert not await jobs.process_next_job(mongo_db, blob_store)
+
+    await mongo_db[jobs.JOBS_COLLECTION].update_one({"_id": job["_id"]}, {"$set": {"lease_until": job["created_at"]}})
+    assert await jobs.process_next_job(mongo_db, blob_store)
+
+    job = await users.get_job(job_id=job_id, current_user=ADMIN, mongo_db=mongo_db)
+    assert (job["status"], job["attempts"]) == ("done", 2)
+    assert await mongo_db["posts"].count_documents({}) == 0
+    assert await get_post_count(mongo_db, "user0") == 0
+
+    with pytest.raises(Exception) as error:
+        await users.get_job(job_id="not-a-job", current_user=ADMIN, mongo_db=mongo_db)
+    assert error.value.status_code == 404
+
+
+async def test_failed_jobs_are_logged_and_retried(mongo_db, tmp_path, monkeypatch, caplog):
+    async def failing_runner(db, blob_store, job):
+        raise RuntimeError("storage unavailable")
+
+    monkeypatch.setitem(jobs.JOB_RUNNERS, jobs.DELETE_POSTS_JOB, failing_runner)
+    blob_store = LocalBlobStore(str(tmp_path / "blobs"))
+    job_id = await jobs.create_delete_posts_job(mongo_db, ["user0"])
+
+    with caplog.at_level(logging.ERROR, logger=jobs.__name__):
+        assert await jobs.process_next_job(mongo_db, blob_store)
+
+    assert caplog.records[-1].getMessage() == f"Job {job_id} failed"
+    assert caplog.records[-1].exc_info[1].args == ("storage unavailable",)
+    job = await users.get_job(job_id=job_id, current_user=ADMIN, mongo_db=mongo_db)
+    assert (job["status"], job["error"]) == ("running", "storage unavailable")
+
+
+def test_job_worker_survives_successive_event_loops(monkeypatch):
+    processed = []
+
+    async def process_next_job(db, blob_store):
+        processed.append(asyncio.get_running_loop())
+        return False
+
+    monkeypatch.setattr(jobs, "process_next_job", process_next_job)
+    worker = jobs.JobWorker(poll_interval=60)
+
+    # Like two lifespans (or two TestClients) sharing the module-level worker
+    async def lifespan():
+        worker.start(None, None)
+        await asyncio.sleep(0)
+        worker.notify()
+        await asyncio.sleep(0.01)
+        assert not worker.task.done()
+        await worker.stop()
+        return asyncio.get_running_loop()
+
+    loops = [asyncio.run(lifespan()) for _ in range(2)]
+    assert processed == [loops[0], loops[0], loops[1], loops[1]]
+
+
+async def test_delete_posts_job_keeps_the_posts_of_a_registered_again_user(mongo_db, tmp_path):
+    blob_store = LocalBlobStore(str(tmp_path / "blobs"))
+    author = {"username": "user0", "role": "user"}
+    await forum.create_post(post=PostUpdate(title="Old post", content="Content"), current_user=author,
+                            mongo_db=mongo_db, blob_store=blob_store)
+    await mongo_db["posts"].update_many({}, {"$set": {"created_at": datetime(2025, 1, 1)}})
+    job_id = await jobs.create_delete_posts_job(mongo_db, ["user0"])
+    await mongo_db[jobs.JOBS_COLLECTION].update_one({}, {"$set": {"created_at": datetime(2025, 1, 2)}})
+
+    # user0 registers again and posts before the job runs
+    await forum.create_post(post=PostUpdate(title="New post", content="Content"), current_user=author,
+                            mongo_db=mongo_db, blob_store=blob_store)
+    await run_jobs(mongo_db, blob_store)
+
+    job = await users.get_job(job_id=job_id, current_user=ADMIN, mongo_db=mongo_db)
+    assert (job["status"], job["total_posts"], job["deleted_posts"]) == ("done", 1, 1)
+    assert [post["title"] async for post in mongo_db["posts"].find()] == ["New post"]
+    assert await get_post_count(mongo_db, "user0") == 1
+
+
+async def test_admin_lists_users_by_page(db):
+    async def list_users(**kwargs):
+        return await users.get_users(current_user=ADMIN, db=db, **{
+            "limit": 20, "cursor": None, "role": None, "prefix": None, **kwargs})
+
+    first_page = await list_users(limit=3)
+    assert [user["username"] for user in first_page["users"]] == ["admin", "user0", "user1"]
+    assert set(first_page["users"][0]) == {"id", "username", "role"}
+
+    last_page = await list_users(limit=3, cursor=first_page["next_cursor"])
+    assert [user["username"] for user in last_page["users"]] == ["user2"]
+    assert last_page["next_cursor"] is None
+
+    assert [user["username"] for user in (await list_users(role="admin"))["users"]] == ["admin"]
+    assert [user["username"] for user in (await list_users(prefix="user"))["users"]] == ["user0", "user1", "user2"]
+    assert (await list_users(prefix="user_"))["users"] == []
+    assert (await list_users(prefix="User"))["users"] == []
+
+    # The role column is nullable, a user without role is still listed
+    await db.execute(update(User).where(User.username == "user2").values(role=None))
+    await db.commit()
+    page = UserPage.model_validate(await list_users(prefix="user2"))
+    assert page.users[0].role is None
+
+    with pytest.raises(Exception) as error:
+        await users.get_users(current_user={"username": "user0", "role": "user"}, db=db, limit=20, cursor=None,
+                              role=None, prefix=None)
+    assert (error.value.status_code, error.value.detail) == (403, "Only admins can list users")
+
+    with pytest.raises(Exception) as error:
+        await list_users(cursor="not-a-cursor")
+    assert error.value.status_code == 400
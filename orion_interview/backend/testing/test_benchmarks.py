@@ -0,0 +1,21 @@
+from backend.benchmarks.endpoints import percentile, run_benchmarks, summarize
+
+
+def test_summarize_reports_percentiles_and_throughput():
+    stats = summarize([0.001 * index for index in range(1, 101)], errors=2)
+    assert stats["requests"] == 100
+    assert stats["errors"] == 2
+    assert stats["p50_ms"] == 50
+    assert stats["p95_ms"] == 95
+    assert stats["p99_ms"] == 99
+    assert percentile([0.5], 99) == 0.5
+
+
+def test_benchmarks_cover_every_endpoint_without_errors():
+    report = run_benchmarks(iterations=2)
+    assert set(report["endpoints"]) == {
+        "register", "login", "create_post", "list_posts", "get_post", "update_post", "profile",
+        "all_users", "change_user_role", "change_users_role", "delete_post", "delete_user", "delete_users"}
+    for stats in report["endpoints"].values():
+        assert stats["requests"] == 2
+        assert stats["errors"] == 0
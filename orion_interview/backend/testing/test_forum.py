@@ -1,18 +1,30 @@
 import pytest
 import os
+import base64
+import gzip
+import io
+import json
+from bson.objectid import ObjectId
+from PIL import Image
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.requests import Request
 from backend.app.models.user import Base, User
 from backend.app.routers import forum
 from backend.app.schemas.post import PostUpdate
+from backend.app.utils import images
+from backend.app.utils.counters import get_post_count
+from backend.app.utils.indexes import ensure_indexes_async
+from backend.app.utils.pagination import encode_cursor
+from backend.app.utils.response_cache import VERSIONS_COLLECTION, response_cache
 from backend.app.utils.security import get_password_hash
+from backend.app.utils.storage import LocalBlobStore
+
+pytestmark = pytest.mark.anyio
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 TEST_DB_NAME = "forum_test"
-client = MongoClient(MONGO_URL)
-test_db = client[TEST_DB_NAME]
-mock_posts_collection = test_db["posts"]
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={
@@ -30,9 +42,7 @@ def override_get_db():
 
 
 @pytest.fixture(scope="function", autouse=True)
-def setup_database(monkeypatch):
-    monkeypatch.setattr(forum, "posts_collection", mock_posts_collection)
-
+def setup_database():
     Base.metadata.create_all(bind=engine)
     db = TestingSessionLocal()
 
@@ -43,57 +53,428 @@ def setup_database(monkeypatch):
     db.commit()
     db.close()
 
-    mock_posts_collection.delete_many({})
-
     yield
 
     Base.metadata.drop_all(bind=engine)
-    mock_posts_collection.delete_many({})
 
 
-def test_user1_create_edit_delete_post():
+@pytest.fixture(scope="function")
+async def mongo_db():
+    client = AsyncIOMotorClient(MONGO_URL)
+    test_db = client[TEST_DB_NAME]
+    await test_db["posts"].delete_many({})
+    await test_db["author_stats"].delete_many({})
+    await test_db[VERSIONS_COLLECTION].delete_many({})
+    response_cache.clear()
+
+    yield test_db
+
+    await test_db["posts"].delete_many({})
+    await test_db["author_stats"].delete_many({})
+    await test_db[VERSIONS_COLLECTION].delete_many({})
+    response_cache.clear()
+    client.close()
+
+
+@pytest.fixture(scope="function")
+def blob_store(tmp_path):
+    return LocalBlobStore(str(tmp_path))
+
+
+async def read_body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+async def list_posts(**kwargs):
+    return json.loads((await forum.get_posts(**kwargs)).body)
+
+
+def streamed_request(body: bytes, chunk_size: int = 16):
+    chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)] or [b""]
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    return Request({"type": "http", "method": "POST", "headers": []}, receive)
+
+
+async def test_user1_create_edit_delete_post(mongo_db, blob_store):
     current_user = {"username": "testuser1", "role": "user"}
 
     post_data = PostUpdate(title="My First Post",
                            content="This is my first post.")
-    response = forum.create_post(post=post_data, current_user=current_user)
+    response = await forum.create_post(post=post_data, current_user=current_user,
+                                       mongo_db=mongo_db, blob_store=blob_store)
     assert response["message"] == "Post created successfully."
 
-    posts = list(forum.get_posts(current_user=current_user))
+    posts = (await list_posts(current_user=current_user, mongo_db=mongo_db))["posts"]
     assert len(posts) == 1
     post_id = posts[0]["_id"]
 
     updated_post_data = PostUpdate(
         title="My Updated Post", content="Updated content.")
-    update_response = forum.update_post(
-        id=post_id, updated_post=updated_post_data, current_user=current_user)
+    update_response = await forum.update_post(
+        id=post_id, updated_post=updated_post_data, current_user=current_user,
+        mongo_db=mongo_db, blob_store=blob_store)
     assert update_response["message"] == "Post updated successfully."
 
-    delete_response = forum.delete_post(id=post_id, current_user=current_user)
+    delete_response = await forum.delete_post(id=post_id, current_user=current_user,
+                                              mongo_db=mongo_db, blob_store=blob_store)
     assert delete_response["message"] == "Post deleted successfully."
 
+    # A malformed id is an unknown post
+    for call in (forum.get_post(id="not-a-post-id", current_user=current_user, mongo_db=mongo_db),
+                 forum.update_post(id="not-a-post-id", updated_post=updated_post_data, current_user=current_user,
+                                   mongo_db=mongo_db, blob_store=blob_store),
+                 forum.delete_post(id="not-a-post-id", current_user=current_user,
+                                   mongo_db=mongo_db, blob_store=blob_store)):
+        with pytest.raises(Exception) as error:
+            await call
+        assert error.value.status_code == 404
 
-def test_user2_cannot_edit_or_delete_user1_post():
+
+async def test_user2_cannot_edit_or_delete_user1_post(mongo_db, blob_store):
     user1 = {"username": "testuser1", "role": "user"}
     user2 = {"username": "testuser2", "role": "user"}
 
     post_data = PostUpdate(title="User1's Post",
                            content="This is user1's post.")
-    forum.create_post(post=post_data, current_user=user1)
+    await forum.create_post(post=post_data, current_user=user1,
+                            mongo_db=mongo_db, blob_store=blob_store)
 
-    posts = list(forum.get_posts(current_user=user1))
+    posts = (await list_posts(current_user=user1, mongo_db=mongo_db))["posts"]
     assert len(posts) == 1
     post_id = posts[0]["_id"]
 
     updated_post_data = PostUpdate(
         title="Hacked Post", content="Hacked content.")
     with pytest.raises(Exception) as error:
-        forum.update_post(
-            id=post_id, updated_post=updated_post_data, current_user=user2)
+        await forum.update_post(
+            id=post_id, updated_post=updated_post_data, current_user=user2,
+            mongo_db=mongo_db, blob_store=blob_store)
     assert error.value.status_code == 403
     assert error.value.detail == "You do not have permission to edit this post."
 
     with pytest.raises(Exception) as error:
-        forum.delete_post(id=post_id, current_user=user2)
+        await forum.delete_post(id=post_id, current_user=user2,
+                                mongo_db=mongo_db, blob_store=blob_store)
     assert error.value.status_code == 403
     assert error.value.detail == "You do not have permission to delete this post."
+
+
+async def test_get_posts_pagination(mongo_db, blob_store):
+    current_user = {"username": "testuser1", "role": "user"}
+
+    for index in range(5):
+        await forum.create_post(post=PostUpdate(title=f"Post {index}", content="Content"),
+                                current_user=current_user, mongo_db=mongo_db, blob_store=blob_store)
+
+    first_page = await list_posts(limit=2, current_user=current_user, mongo_db=mongo_db)
+    assert [post["title"] for post in first_page["posts"]] == ["Post 4", "Post 3"]
+    assert first_page["next_cursor"] is not None
+
+    second_page = await list_posts(
+        limit=2, cursor=first_page["next_cursor"], current_user=current_user, mongo_db=mongo_db)
+    assert [post["title"] for post in second_page["posts"]] == ["Post 2", "Post 1"]
+
+    last_page = await list_posts(
+        limit=2, cursor=second_page["next_cursor"], current_user=current_user, mongo_db=mongo_db)
+    assert [post["title"] for post in last_page["posts"]] == ["Post 0"]
+    assert last_page["next_cursor"] is None
+
+    with pytest.raises(Exception) as error:
+        await list_posts(cursor="not-a-cursor", current_user=current_user, mongo_db=mongo_db)
+    assert error.value.status_code == 400
+
+    # Operators smuggled inside the cursor must not reach the query
+    for position in ({"created_at": {"$regex": "."}, "_id": {"$gt": ObjectId()}},
+                     {"created_at": "2025-01-01", "_id": str(ObjectId())}, {"_id": ObjectId()}):
+        with pytest.raises(Exception) as error:
+            await list_posts(cursor=encode_cursor(position), current_user=current_user, mongo_db=mongo_db)
+        assert (error.value.status_code, error.value.detail) == (400, "Invalid cursor.")
+
+
+def encode_image(size: tuple, image_format: str, exif=None):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format=image_format, **({"exif": exif} if exif else {}))
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+async def test_post_photo_is_stored_as_blob(mongo_db, blob_store):
+    current_user = {"username": "testuser1", "role": "user"}
+
+    post_data = PostUpdate(title="Photo Post", content="With a photo.", photo=encode_image((64, 64), "PNG"))
+    await forum.create_post(post=post_data, current_user=current_user,
+                            mongo_db=mongo_db, blob_store=blob_store)
+
+    post = (await list_posts(current_user=current_user, mongo_db=mongo_db))["posts"][0]
+    assert "photo" not in await mongo_db["posts"].find_one()
+    photo_id = post["photo_id"]
+    blob, length, _ = await blob_store.open(photo_id)
+    photo = await blob.read(length)
+    blob.close()
+
+    response = await forum.get_post_photo(id=post["_id"], current_user=current_user,
+                                          mongo_db=mongo_db, blob_store=blob_store)
+    assert response.status_code == 200
+    assert response.media_type == "image/webp"
+    assert response.headers["ETag"] == f'"{photo_id}"'
+    assert await read_body(response) == photo
+
+    response = await forum.get_post_photo(
+        id=post["_id"], range_header="bytes=8-11", current_user=current_user,
+        mongo_db=mongo_db, blob_store=blob_store)
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes 8-11/{len(photo)}"
+    assert await read_body(response) == photo[8:12]
+
+    response = await forum.get_post_photo(
+        id=post["_id"], if_none_match=f'"{photo_id}"', current_user=current_user,
+        mongo_db=mongo_db, blob_store=blob_store)
+    assert response.status_code == 304
+
+    with pytest.raises(Exception) as error:
+        await forum.get_post_photo(
+            id=post["_id"], range_header=f"bytes={len(photo)}-", current_user=current_user,
+            mongo_db=mongo_db, blob_store=blob_store)
+    assert error.value.status_code == 416
+
+    with pytest.raises(Exception) as error:
+        await forum.get_post_photo(id="not-a-post-id", current_user=current_user,
+                                   mongo_db=mongo_db, blob_store=blob_store)
+    assert error.value.status_code == 404
+
+    await forum.delete_post(id=post["_id"], current_user=current_user,
+                            mongo_db=mongo_db, blob_store=blob_store)
+    with pytest.raises(Exception):
+        await blob_store.open(photo_id)
+
+
+async def test_post_counters_follow_creates_and_deletes(mongo_db, blob_store):
+    user1 = {"username": "testuser1", "role": "user"}
+    admin = {"username": "admin", "role": "admin"}
+
+    for index in range(3):
+        await forum.create_post(post=PostUpdate(title=f"Post {index}", content="Content"),
+                                current_user=user1, mongo_db=mongo_db, blob_store=blob_store)
+    assert await get_post_count(mongo_db, "testuser1") == 3
+    assert await get_post_count(mongo_db, "testuser2") == 0
+
+    post_id = (await list_posts(current_user=user1, mongo_db=mongo_db))["posts"][0]["_id"]
+    await forum.delete_post(id=post_id, current_user=admin,
+                            mongo_db=mongo_db, blob_store=blob_store)
+    assert await get_post_count(mongo_db, "testuser1") == 2
+
+
+async def test_admin_exports_posts_as_ndjson(mongo_db, blob_store):
+    user1 = {"username": "testuser1", "role": "user"}
+    admin = {"username": "admin", "role": "admin"}
+
+    for index in range(5):
+        await forum.create_post(post=PostUpdate(title=f"Post {index}", content="Content"),
+                                current_user=user1, mongo_db=mongo_db, blob_store=blob_store)
+
+    # Photos stored inside GridFS are referenced by an ObjectId
+    photo_id = ObjectId()
+    await mongo_db["posts"].update_one({"title": "Post 0"}, {"$set": {"photo_id": photo_id}})
+
+    response = await forum.export_posts(batch_size=2, current_user=admin, mongo_db=mongo_db)
+    assert response.media_type == "application/x-ndjson"
+    chunks = [chunk async for chunk in response.body_iterator]
+    assert len(chunks) == 3
+    posts = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert [post["title"] for post in posts] == [f"Post {index}" for index in range(5)]
+    assert posts[0]["author"] == "testuser1"
+    assert posts[0]["photo_id"] == str(photo_id)
+
+    response = await forum.export_posts(batch_size=2, gzip=True, current_user=admin, mongo_db=mongo_db)
+    assert response.media_type == "application/gzip"
+    assert gzip.decompress(await read_body(response)).splitlines() == b"".join(chunks).splitlines()
+
+    with pytest.raises(Exception) as error:
+        await forum.export_posts(current_user=user1, mongo_db=mongo_db)
+    assert error.value.status_code == 403
+
+
+async def test_admin_imports_posts_from_ndjson(mongo_db):
+    admin = {"username": "admin", "role": "admin"}
+    existing_id = str((await mongo_db["posts"].insert_one(
+        {"title": "Existing", "content": "Content", "author": "testuser2"})).inserted_id)
+
+    lines = [
+        json.dumps({"title": "Imported 1", "content": "Content", "author": "testuser1",
+                    "created_at": "2024-05-01T10:00:00"}),
+        "",
+        "{not json",
+        json.dumps({"title": "Imported 2", "content": "Content", "author": "testuser1"}),
+        json.dumps({"title": "No author", "content": "Content"}),
+        json.dumps({"_id": existing_id, "title": "Duplicate", "content": "Content", "author": "testuser2"}),
+        json.dumps({"title": "Imported 3", "content": "Content", "author": "testuser2",
+                    "photo_id": "someone-elses-blob", "thumbnails": {"small": "another-blob"}}),
+    ]
+    body = "\n".join(lines).encode("utf-8")
+
+    report = await forum.import_posts(request=streamed_request(body), batch_size=2,
+                                      current_user=admin, mongo_db=mongo_db)
+    assert report["imported"] == 3
+    assert report["failed"] == 3
+    assert [error["line"] for error in report["errors"]] == [3, 5, 6]
+    assert await mongo_db["posts"].count_documents({}) == 4
+    assert await get_post_count(mongo_db, "testuser1") == 2
+    assert await get_post_count(mongo_db, "testuser2") == 1
+    imported = await mongo_db["posts"].find_one({"title": "Imported 3"})
+    assert (imported["photo_id"], imported["thumbnails"]) == (None, None)
+
+    report = await forum.import_posts(request=streamed_request(gzip.compress(lines[0].encode("utf-8"))),
+                                      content_encoding="gzip", current_user=admin, mongo_db=mongo_db)
+    assert report["imported"] == 1
+
+    compressed = gzip.compress(lines[0].encode("utf-8"))
+    for body in (compressed[:-4], compressed + b"trailing data"):
+        with pytest.raises(Exception) as error:
+            await forum.import_posts(request=streamed_request(body), content_encoding="gzip",
+                                     current_user=admin, mongo_db=mongo_db)
+        assert error.value.status_code == 400
+
+    with pytest.raises(Exception) as error:
+        await forum.import_posts(request=streamed_request(b""), current_user={"username": "testuser1", "role": "user"},
+                                 mongo_db=mongo_db)
+    assert error.value.status_code == 403
+
+
+async def test_import_rejects_oversized_lines(mongo_db, monkeypatch):
+    monkeypatch.setattr(forum, "IMPORT_MAX_LINE_SIZE", 200)
+    admin = {"username": "admin", "role": "admin"}
+    lines = [
+        json.dumps({"title": "Short", "content": "Content", "author": "testuser1"}),
+        json.dumps({"title": "Long", "content": "x" * 300, "author": "testuser1"}),
+        json.dumps({"title": "Short again", "content": "Content", "author": "testuser1"}),
+    ]
+
+    # The whole body arrives in a single chunk, the long line is complete inside it
+    body = "\n".join(lines).encode("utf-8")
+    report = await forum.import_posts(request=streamed_request(body, chunk_size=len(body)),
+                                      current_user=admin, mongo_db=mongo_db)
+    assert (report["imported"], report["failed"]) == (2, 1)
+    assert report["errors"] == [{"line": 2, "error": "Line is longer than 200 bytes."}]
+
+
+async def test_post_responses_are_cached_until_next_write(mongo_db, blob_store):
+    current_user = {"username": "testuser1", "role": "user"}
+    await forum.create_post(post=PostUpdate(title="Cached", content="Content"),
+                            current_user=current_user, mongo_db=mongo_db, blob_store=blob_store)
+
+    first = await forum.get_posts(current_user=current_user, mongo_db=mongo_db)
+    etag = first.headers["ETag"]
+    second = await forum.get_posts(current_user=current_user, mongo_db=mongo_db)
+    assert second.body == first.body
+    assert response_cache.hits == 1
+
+    not_modified = await forum.get_posts(if_none_match=etag, current_user=current_user, mongo_db=mongo_db)
+    assert not_modified.status_code == 304
+
+    post_id = json.loads(first.body)["posts"][0]["_id"]
+    post = await forum.get_post(id=post_id, current_user=current_user, mongo_db=mongo_db)
+    assert json.loads(post.body)["title"] == "Cached"
+
+    await forum.update_post(id=post_id, updated_post=PostUpdate(title="Updated", content="Content"),
+                            current_user=current_user, mongo_db=mongo_db, blob_store=blob_store)
+    modified = await forum.get_posts(if_none_match=etag, current_user=current_user, mongo_db=mongo_db)
+    assert modified.status_code == 200
+    assert modified.headers["ETag"] != etag
+    assert json.loads(modified.body)["posts"][0]["title"] == "Updated"
+    post = await forum.get_post(id=post_id, current_user=current_user, mongo_db=mongo_db)
+    assert json.loads(post.body)["title"] == "Updated"
+
+
+async def test_post_photo_thumbnails(mongo_db, blob_store):
+    current_user = {"username": "testuser1", "role": "user"}
+    post_data = PostUpdate(title="Photo Post", content="With a photo.", photo=encode_image((1000, 500), "JPEG"))
+    await forum.create_post(post=post_data, current_user=current_user,
+                            mongo_db=mongo_db, blob_store=blob_store)
+
+    post = (await list_posts(current_user=current_user, mongo_db=mongo_db))["posts"][0]
+    assert set(post["thumbnails"]) == {"small", "medium"}
+
+    response = await forum.get_post_photo(id=post["_id"], size="small", current_user=current_user,
+                                          mongo_db=mongo_db, blob_store=blob_store)
+    assert response.headers["ETag"] == f'"{post["thumbnails"]["small"]}"'
+    assert Image.open(io.BytesIO(await read_body(response))).size == (160, 80)
+
+    with pytest.raises(Exception) as error:
+        await forum.get_post_photo(id=post["_id"], size="huge", current_user=current_user,
+                                   mongo_db=mongo_db, blob_store=blob_store)
+    assert error.value.status_code == 400
+
+    await forum.delete_post(id=post["_id"], current_user=current_user,
+                            mongo_db=mongo_db, blob_store=blob_store)
+    for blob_id in post["thumbnails"].values():
+        with pytest.raises(Exception):
+            await blob_store.open(blob_id)
+
+
+async def test_uploaded_photos_are_validated_and_reencoded(mongo_db, blob_store, monkeypatch):
+    current_user = {"username": "testuser1", "role": "user"}
+    monkeypatch.setattr(images, "PHOTO_MAX_SIZE", 300)
+    # Orientation 6: the camera was rotated, the photo must be displayed rotated by 90 degrees
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = "Phone Maker"
+
+    await forum.create_post(post=PostUpdate(title="Photo", content="Content", photo=encode_image((600, 200), "JPEG", exif)),
+                            current_user=current_user, mongo_db=mongo_db, blob_store=blob_store)
+    post = (await list_posts(current_user=current_user, mongo_db=mongo_db))["posts"][0]
+    blob, length, content_type = await blob_store.open(post["photo_id"])
+    stored = Image.open(io.BytesIO(await blob.read(length)))
+    blob.close()
+    assert content_type == "image/webp"
+    assert stored.format == "WEBP"
+    assert stored.size == (100, 300)
+    assert not stored.getexif()
+
+    for photo in [base64.b64encode(b"GIF89a not a photo").decode("utf-8"), encode_image((10, 10), "GIF")]:
+        with pytest.raises(Exception) as error:
+            await forum.create_post(post=PostUpdate(title="Photo", content="Content", photo=photo),
+                                    current_user=current_user, mongo_db=mongo_db, blob_store=blob_store)
+        assert error.value.status_code == 400
+        assert error.value.detail == "Photo must be a JPEG or PNG image."
+
+
+async def test_search_posts_ranks_and_paginates(mongo_db, blob_store):
+    current_user = {"username": "testuser1", "role": "user"}
+    await ensure_indexes_async(mongo_db)
+
+    await forum.create_post(post=PostUpdate(title="Gardening", content="Tomatoes need sun. " * 30),
+                            current_user=current_user, mongo_db=mongo_db, blob_store=blob_store)
+    await forum.create_post(post=PostUpdate(title="Cooking", content="A sauce with tomatoes."),
+                            current_user=current_user, mongo_db=mongo_db, blob_store=blob_store)
+    await forum.create_post(post=PostUpdate(title="Tomatoes", content="All about tomatoes."),
+                            current_user=current_user, mongo_db=mongo_db, blob_store=blob_store)
+    await forum.create_post(post=PostUpdate(title="Unrelated", content="Nothing to see."),
+                            current_user=current_user, mongo_db=mongo_db, blob_store=blob_store)
+
+    async def search(**kwargs):
+        response = await forum.search_posts(current_user=current_user, mongo_db=mongo_db, **kwargs)
+        return json.loads(response.body)
+
+    first_page = await search(q="tomato", limit=2)
+    # A match inside the title weighs more than one inside the content
+    assert first_page["results"][0]["title"] == "Tomatoes"
+    assert len(first_page["results"]) == 2
+    assert set(first_page["results"][0]) == {"_id", "title", "snippet", "author", "created_at", "score"}
+    assert all(len(result["snippet"]) <= forum.SEARCH_SNIPPET_LENGTH for result in first_page["results"])
+
+    last_page = await search(q="tomato", limit=2, cursor=first_page["next_cursor"])
+    assert len(last_page["results"]) == 1
+    assert last_page["next_cursor"] is None
+    titles = {result["title"] for result in first_page["results"] + last_page["results"]}
+    assert titles == {"Gardening", "Cooking", "Tomatoes"}
+
+    with pytest.raises(Exception) as error:
+        await search(q="tomato", cursor="not-a-cursor")
+    assert error.value.status_code == 400
+
+    with pytest.raises(Exception) as error:
+        await search(q="tomato", cursor=encode_cursor({"score": 1.0, "_id": {"$ne": None}}))
+    assert (error.value.status_code, error.value.detail) == (400, "Invalid cursor.")
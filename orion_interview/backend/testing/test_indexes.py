@@ -0,0 +1,23 @@
+import os
+from pymongo import MongoClient
+from backend.app.utils.indexes import INDEXES, ensure_indexes, find_collscans
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+TEST_DB_NAME = "forum_test"
+client: MongoClient = MongoClient(MONGO_URL)
+test_db = client[TEST_DB_NAME]
+
+
+def test_ensure_indexes_is_idempotent():
+    ensure_indexes(test_db)
+    ensure_indexes(test_db)
+
+    index_names = test_db["posts"].index_information().keys()
+    for index in INDEXES["posts"]:
+        assert index.document["name"] in index_names
+
+
+def test_hot_queries_do_not_scan_collection():
+    ensure_indexes(test_db)
+
+    assert find_collscans(test_db) == []
@@ -0,0 +1,72 @@
+import base64
+import logging
+import os
+import random
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.app.models.user import Base, User
+from backend.app.utils import init_db
+from backend.app.utils.init_db import SEED_PASSWORD, generate_posts, seed_users
+from backend.app.utils.security import verify_password
+from backend.app.utils.storage import LocalBlobStore
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+TEST_DB_NAME = "forum_test"
+
+
+def test_seed_users_bulk_inserts_after_previous_runs():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+
+    with Session(engine) as session:
+        seed_users(session, 5, batch_size=2)
+        # Deleted seeded users and a user named like them must not make the next run collide
+        for user in session.query(User).filter(User.username.in_(["seed_user_0000001", "seed_user_0000002"])):
+            session.delete(user)
+        session.add(User(username="seed_user_admin", hashed_password="hash"))
+        session.commit()
+        seed_users(session, 3, batch_size=2)
+        users = session.query(User).filter(User.username != "seed_user_admin").order_by(User.username).all()
+
+    assert [user.username for user in users] == [f"seed_user_{index:07d}" for index in range(8) if index not in (1, 2)]
+    assert len({user.hashed_password for user in users[:3]}) == 1
+    assert verify_password(SEED_PASSWORD, users[0].hashed_password)
+
+
+def test_generate_posts_is_deterministic():
+    authors = ["admin", "testuser"]
+    first = list(generate_posts(random.Random(42), authors, 50, photo_ratio=0.5))
+    second = list(generate_posts(random.Random(42), authors, 50, photo_ratio=0.5))
+
+    assert first == second
+    assert all(post["author"] in authors for post, _ in first)
+    assert [post["created_at"] for post, _ in first] == sorted(post["created_at"] for post, _ in first)
+    assert 0 < sum(photo is not None for _, photo in first) < 50
+
+
+@pytest.mark.anyio
+async def test_migrate_inline_photos_skips_corrupt_photos(tmp_path, monkeypatch, caplog):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[TEST_DB_NAME]
+    blob_store = LocalBlobStore(str(tmp_path))
+    monkeypatch.setattr(init_db, "get_async_database", lambda: db)
+    monkeypatch.setattr(init_db, "get_blob_store", lambda db: blob_store)
+    await db["posts"].delete_many({})
+    corrupt = (await db["posts"].insert_one({"title": "Corrupt", "photo": "not-base64!"})).inserted_id
+    legacy = (await db["posts"].insert_one(
+        {"title": "Legacy", "photo": base64.b64encode(b"legacy bytes").decode()})).inserted_id
+
+    with caplog.at_level(logging.WARNING, logger=init_db.__name__):
+        await init_db.migrate_inline_photos()
+
+    assert caplog.records[-1].getMessage() == f"Post {corrupt} has a corrupt inline photo, left in place"
+    assert (await db["posts"].find_one({"_id": corrupt}))["photo"] == "not-base64!"
+    migrated = await db["posts"].find_one({"_id": legacy})
+    assert "photo" not in migrated
+    blob, length, _ = await blob_store.open(migrated["photo_id"])
+    assert await blob.read(length) == b"legacy bytes"
+    await db["posts"].delete_many({})
+    client.close()
+
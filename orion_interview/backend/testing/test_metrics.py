@@ -0,0 +1,88 @@
+import httpx
+from datetime import timedelta
+import pytest
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from pymongo.monitoring import CommandFailedEvent, CommandSucceededEvent
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from backend.app.models.user import Base
+from backend.app.routers import auth, metrics
+from backend.app.utils import dependencies
+from backend.app.utils.database import build_async_engine, build_engine
+from backend.app.utils.metrics import MetricsMiddleware, current_scope, mongo_command_metrics
+
+pytestmark = pytest.mark.anyio
+
+
+def sample(name: str, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture(scope="function")
+async def client(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'users.db'}"
+    engine = build_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    async_engine = build_async_engine(database_url)
+
+    async def get_async_db():
+        async with async_sessionmaker(async_engine, expire_on_commit=False)() as session:
+            yield session
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(auth.router, prefix="/auth")
+    app.include_router(metrics.router)
+    app.dependency_overrides[dependencies.get_async_db] = get_async_db
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    await async_engine.dispose()
+
+
+async def test_requests_and_queries_are_recorded_by_route(client):
+    login = {"method": "POST", "route": "/auth/login"}
+    requests_before = sample("http_requests_total", status="401", **login)
+    latency_before = sample("http_request_duration_seconds_count", **login)
+    queries_before = sample("sql_query_duration_seconds_count", operation="SELECT", route="/auth/login")
+    unmatched_before = sample("http_requests_total", method="GET", route="unmatched", status="404")
+
+    response = await client.post("/auth/login", data={"username": "ghost", "password": "password"})
+    assert response.status_code == 401
+    assert (await client.get("/no/such/route")).status_code == 404
+
+    assert sample("http_requests_total", status="401", **login) == requests_before + 1
+    assert sample("http_request_duration_seconds_count", **login) == latency_before + 1
+    assert sample("sql_query_duration_seconds_count", operation="SELECT", route="/auth/login") == queries_before + 1
+    assert sample("http_requests_total", method="GET", route="unmatched", status="404") == unmatched_before + 1
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="POST",route="/auth/login",status="401"}' in response.text
+    assert "threadpool_threads_busy" in response.text
+    assert sample("threadpool_threads_limit") > 0
+
+
+def test_mongodb_commands_are_recorded_by_route():
+    labels = {"command": "find", "route": "/forum/posts/{id}"}
+    count_before = sample("mongodb_command_duration_seconds_count", **labels)
+    failures_before = sample("mongodb_command_failures_total", **labels)
+    fast_before = sample("mongodb_command_duration_seconds_bucket", le="0.0025", **labels)
+
+    class Route:
+        path = "/forum/posts/{id}"
+
+    token = current_scope.set({"type": "http", "route": Route()})
+    try:
+        mongo_command_metrics.succeeded(CommandSucceededEvent(
+            timedelta(milliseconds=2), {"ok": 1}, "find", 1, ("localhost", 27017), 1, database_name="forum"))
+        mongo_command_metrics.failed(CommandFailedEvent(
+            timedelta(milliseconds=1), {"ok": 0}, "find", 2, ("localhost", 27017), 2, database_name="forum"))
+    finally:
+        current_scope.reset(token)
+
+    assert sample("mongodb_command_duration_seconds_count", **labels) == count_before + 2
+    assert sample("mongodb_command_failures_total", **labels) == failures_before + 1
+    assert sample("mongodb_command_duration_seconds_bucket", le="0.0025", **labels) == fast_before + 2
@@ -0,0 +1,81 @@
+import httpx
+import logging
+import pstats
+import pytest
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from backend.app.models.user import Base
+from backend.app.routers import auth
+from backend.app.utils import dependencies, profiling
+from backend.app.utils.database import build_async_engine, build_engine
+from backend.app.utils.metrics import MetricsMiddleware
+
+pytestmark = pytest.mark.anyio
+
+LOGIN = {"username": "ghost", "password": "password"}
+
+
+@pytest.fixture(scope="function")
+async def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0)
+    database_url = f"sqlite:///{tmp_path / 'users.db'}"
+    engine = build_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    async_engine = build_async_engine(database_url)
+
+    async def get_async_db():
+        async with async_sessionmaker(async_engine, expire_on_commit=False)() as session:
+            yield session
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(profiling.ProfilingMiddleware)
+    app.include_router(auth.router, prefix="/auth")
+    app.dependency_overrides[dependencies.get_async_db] = get_async_db
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    await async_engine.dispose()
+
+
+async def test_requests_with_the_debug_token_are_profiled(client, tmp_path):
+    response = await client.post("/auth/login", data=LOGIN, headers={profiling.PROFILE_HEADER: "secret"})
+    assert response.status_code == 401
+    profile_id = response.headers[profiling.PROFILE_ID_HEADER]
+    dump = tmp_path / "profiles" / f"{profile_id}.prof"
+    assert any(function == "login" for _, _, function in pstats.Stats(str(dump)).stats)
+
+    response = await client.post("/auth/login", data=LOGIN, headers={profiling.PROFILE_HEADER: "guess"})
+    assert profiling.PROFILE_ID_HEADER not in response.headers
+    response = await client.post("/auth/login", data=LOGIN)
+    assert profiling.PROFILE_ID_HEADER not in response.headers
+    assert list((tmp_path / "profiles").iterdir()) == [dump]
+
+
+async def test_sampled_profiles_are_pruned(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1)
+    monkeypatch.setattr(profiling, "PROFILE_MAX_DUMPS", 2)
+
+    profile_ids = [(await client.post("/auth/login", data=LOGIN)).headers[profiling.PROFILE_ID_HEADER]
+                   for _ in range(3)]
+
+    assert sorted(path.stem for path in (tmp_path / "profiles").iterdir()) == sorted(profile_ids[1:])
+
+
+async def test_slow_requests_are_logged_with_their_database_calls(client, monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "SLOW_REQUEST_THRESHOLD", 1e-9)
+
+    with caplog.at_level(logging.WARNING, logger=profiling.__name__):
+        await client.post("/auth/login", data=LOGIN)
+
+    message = caplog.records[-1].getMessage()
+    assert message.startswith("Slow request: POST /auth/login (route /auth/login) 401 in ")
+    assert "sql SELECT 1x" in message
+
+    monkeypatch.setattr(profiling, "SLOW_REQUEST_THRESHOLD", 0)
+    caplog.clear()
+    await client.post("/auth/login", data=LOGIN)
+    assert not caplog.records
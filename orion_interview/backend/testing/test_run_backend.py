@@ -0,0 +1,47 @@
+import sys
+import uvicorn
+from backend import run_backend
+
+
+def launch(monkeypatch, *args):
+    calls = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: calls.append((app, kwargs)))
+    monkeypatch.setattr(sys, "argv", ["run-backend", *args])
+    run_backend.main()
+    assert len(calls) == 1
+    return calls[0]
+
+
+def test_default_mode_runs_the_reloader(monkeypatch):
+    app, options = launch(monkeypatch)
+
+    assert app == "backend.app.main:app"
+    assert options["reload"] is True
+    assert "workers" not in options
+
+
+def test_production_mode_runs_one_worker_per_core(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "counter_1234.db").write_bytes(b"stale")
+    monkeypatch.setattr(run_backend, "available_cores", lambda: 8)
+    monkeypatch.setattr(run_backend, "BACKEND_PORT", 9000)
+
+    app, options = launch(monkeypatch, "--production")
+
+    assert app == "backend.app.main:app"
+    assert options["workers"] == 8
+    assert options["reload"] is False
+    assert options["port"] == 9000
+    assert options["backlog"] == run_backend.BACKEND_BACKLOG
+    assert options["timeout_keep_alive"] == run_backend.BACKEND_KEEP_ALIVE
+    assert options["loop"] == options["http"] == "auto"
+    assert not list(tmp_path.iterdir())
+
+
+def test_production_mode_with_a_single_worker(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+
+    app, options = launch(monkeypatch, "--production", "--workers", "1")
+
+    assert options["workers"] == 1
+    assert "PROMETHEUS_MULTIPROC_DIR" not in run_backend.os.environ
@@ -0,0 +1,24 @@
+import os
+import pytest
+from backend.app.utils.workers import WorkerPool
+
+pytestmark = pytest.mark.anyio
+
+
+def crash_once(marker: str):
+    # The first call kills its worker process, like the OOM killer would
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "done"
+
+
+async def test_a_dead_worker_process_is_replaced(tmp_path):
+    pool = WorkerPool(1)
+    try:
+        first_executor = pool._get_executor()
+        assert await pool.run(crash_once, str(tmp_path / "crashed")) == "done"
+        assert pool._executor is not first_executor
+        assert await pool.run(pow, 2, 3) == 8
+    finally:
+        pool.shutdown()
@@ -1,11 +1,16 @@
+import os
 import streamlit as st
 from views.sign_in import sign_in
 from views.sign_up import sign_up
 from views.posts import posts
 from views.profile import profile
 from views.admin import admin
+from utils.api import get_timings
 from utils.auth import is_authenticated, logout, get_username
 
+# Show the latest backend calls and their latency inside the sidebar
+SHOW_API_TIMINGS = os.getenv("SHOW_API_TIMINGS", "false").lower() == "true"
+
 
 PAGES = {
     "Sign In": sign_in,
@@ -36,6 +41,10 @@ def main():
     page = PAGES[selected_page]
     page()
 
+    if SHOW_API_TIMINGS:
+        with st.sidebar.expander("API timings"):
+            st.dataframe(get_timings()[::-1])
+
 
 if __name__ == "__main__":
     main()
@@ -1,28 +1,107 @@
 import requests
 import os
+import time
+import streamlit as st
+from collections import deque
+from urllib3.util.retry import Retry
 
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+# Connections kept alive towards the backend, shared by all the user sessions of the frontend process
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))
+# Retries are only done for idempotent methods (GET, PUT, DELETE...), never for POST
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_BACKOFF_FACTOR = float(os.getenv("API_BACKOFF_FACTOR", "0.3"))
+API_TIMINGS_SIZE = int(os.getenv("API_TIMINGS_SIZE", "200"))
 
 
-def post(endpoint: str, data: dict, token: str | None = None):
+def build_session():
     """
-    POST method implementation
+    Build the HTTP session used for every backend call. Its connection pool keeps the connections alive between calls.
+
+    Returns:
+        requests.Session: The configured session
+    """
+    retry = Retry(
+        total=API_RETRIES,
+        backoff_factor=API_BACKOFF_FACTOR,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = build_session()
+
+
+def session_timings() -> deque[dict]:
+    """
+    Return the latest calls of the current user session, as {"method", "endpoint", "status", "elapsed_ms"} dicts,
+    oldest first. They are kept inside the session state, every browser session of the process has its own.
+    """
+    if "api_timings" not in st.session_state:
+        st.session_state["api_timings"] = deque(maxlen=API_TIMINGS_SIZE)
+    return st.session_state["api_timings"]
+
+
+def request(method: str, endpoint: str, token: str | None = None, **kwargs):
+    """
+    Send a request to the backend through the shared session and record how long it took
 
     Args:
+        method (str): HTTP method of the request
         endpoint (str): Endpoint for the request
-        data (dict): Dictionary containing the request data 
         token (str | None, optional): The generated JWT token. Defaults to None.
 
     Returns:
-        dict: The json response in dict format
+        requests.Response: The backend response
     """
-    headers = {"Content-Type": "application/json"}
+    headers = kwargs.pop("headers", {})
     if token:
         headers["Authorization"] = f"Bearer {token}"
 
-    response = requests.post(
-        f"{BASE_URL}{endpoint}", json=data, headers=headers)
-    return response.json()
+    start = time.perf_counter()
+    status = None
+    try:
+        response = session.request(method, f"{BASE_URL}{endpoint}", headers=headers,
+                                   timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT), **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        session_timings().append({
+            "method": method,
+            "endpoint": endpoint,
+            "status": status,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+        })
+
+
+def get_timings():
+    """
+    Return the timings of the latest backend calls of the current user session, oldest first.
+    """
+    return list(session_timings())
+
+
+def post(endpoint: str, data: dict, token: str | None = None):
+    """
+    POST method implementation
+
+    Args:
+        endpoint (str): Endpoint for the request
+        data (dict): Dictionary containing the request data
+        token (str | None, optional): The generated JWT token. Defaults to None.
+
+    Returns:
+        dict: The json response in dict format
+    """
+    return request("POST", endpoint, token, json=data).json()
 
 
 def post_form(endpoint: str, data: dict):
@@ -37,9 +116,7 @@ def post_form(endpoint: str, data: dict):
         dict: The json response in dict format
     """
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    response = requests.post(
-        f"{BASE_URL}{endpoint}", data=data, headers=headers)
-    return response.json()
+    return request("POST", endpoint, data=data, headers=headers).json()
 
 
 def put(endpoint: str, data: dict, token: str | None = None):
@@ -54,13 +131,7 @@ def put(endpoint: str, data: dict, token: str | None = None):
     Returns:
         dict: The json response in dict format
     """
-    headers = {"Content-Type": "application/json"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-
-    response = requests.put(f"{BASE_URL}{endpoint}",
-                            json=data, headers=headers)
-    return response.json()
+    return request("PUT", endpoint, token, json=data).json()
 
 
 def delete(endpoint: str, data: dict, token: str | None = None):
@@ -75,13 +146,7 @@ def delete(endpoint: str, data: dict, token: str | None = None):
     Returns:
         dict: The json response in dict format
     """
-    headers = {"Content-Type": "application/json"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-
-    response = requests.delete(
-        f"{BASE_URL}{endpoint}", json=data, headers=headers)
-    return response.json()
+    return request("DELETE", endpoint, token, json=data).json()
 
 
 def get(endpoint: str, token: str | None = None):
@@ -95,8 +160,21 @@ def get(endpoint: str, token: str | None = None):
     Returns:
         dict: The json response in dict format
     """
-    headers = {}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    response = requests.get(f"{BASE_URL}{endpoint}", headers=headers)
-    return response.json()
+    return request("GET", endpoint, token).json()
+
+
+def get_bytes(endpoint: str, token: str | None = None):
+    """
+    GET method implementation for binary content (e.g. post photos)
+
+    Args:
+        endpoint (str): Endpoint for the request
+        token (str | None, optional): The generated JWT token. Defaults to None.
+
+    Returns:
+        bytes | None: The response content, or None if the request failed
+    """
+    response = request("GET", endpoint, token)
+    if not response.ok:
+        return None
+    return response.content
@@ -0,0 +1,70 @@
+import os
+import streamlit as st
+from utils.api import request
+
+# Pages of posts are kept for a short time, photos (whose blobs never change) for longer.
+# max_entries bounds the memory used by each cache, the least recently used entries are dropped first.
+POSTS_CACHE_TTL = int(os.getenv("POSTS_CACHE_TTL", "30"))
+POSTS_CACHE_SIZE = int(os.getenv("POSTS_CACHE_SIZE", "256"))
+PHOTO_CACHE_TTL = int(os.getenv("PHOTO_CACHE_TTL", "600"))
+PHOTO_CACHE_SIZE = int(os.getenv("PHOTO_CACHE_SIZE", "64"))
+
+
+def get_posts_generation():
+    """
+    Return the generation of the posts cache of the current session.
+    """
+    return st.session_state.setdefault("posts_cache_generation", 0)
+
+
+def invalidate_posts():
+    """
+    Make the next rerun of the current session fetch fresh pages of posts, used after a create/edit/delete.
+    """
+    st.session_state["posts_cache_generation"] = get_posts_generation() + 1
+
+
+@st.cache_data(ttl=POSTS_CACHE_TTL, max_entries=POSTS_CACHE_SIZE, show_spinner=False)
+def fetch_posts_page(endpoint: str, token: str | None, generation: int):
+    """
+    Fetch a page of posts. The result is cached per endpoint, token and generation, failed requests are not cached.
+
+    Args:
+        endpoint (str): Endpoint of the page, including its query string
+        token (str | None): The generated JWT token
+        generation (int): The generation of the posts cache of the session, see get_posts_generation()
+
+    Raises:
+        requests.RequestException: If the page could not be fetched
+
+    Returns:
+        dict: The page of posts
+    """
+    response = request("GET", endpoint, token)
+    response.raise_for_status()
+    return response.json()
+
+
+@st.cache_data(ttl=PHOTO_CACHE_TTL, max_entries=PHOTO_CACHE_SIZE, show_spinner=False)
+def fetch_photo(post_id: str, blob_id: str, token: str | None, size: str | None = None):
+    """
+    Fetch the photo of a post, or one of its thumbnails. A new photo gets new blobs, so a cached photo is never outdated.
+
+    Args:
+        post_id (str): id of the post
+        blob_id (str): id of the blob of the photo, or of the thumbnail
+        token (str | None): The generated JWT token
+        size (str | None, optional): Name of the thumbnail size, None for the original photo. Defaults to None.
+
+    Raises:
+        requests.RequestException: If the photo could not be fetched
+
+    Returns:
+        bytes: The photo content
+    """
+    endpoint = f"/forum/posts/{post_id}/photo"
+    if size:
+        endpoint += f"?size={size}"
+    response = request("GET", endpoint, token)
+    response.raise_for_status()
+    return response.content
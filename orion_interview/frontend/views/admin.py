@@ -1,13 +1,20 @@
+import os
 import streamlit as st
+from urllib.parse import urlencode
 from utils.api import get, put, delete
 from utils.auth import get_token, is_authenticated
 
+# Seconds between two refreshes of the progress of the job deleting the posts of the deleted users
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+USERS_PAGE_SIZE = 50
+
 def admin():
     """
     Implementation of an admin page, with the following functionalities:
-        - Admins can see a list of all non-admin users
-        - They can promote a certain user to admin role
-        - They can delete a certain user
+        - Admins can browse the non-admin users page by page, and search them by username
+        - They can select several users at once
+        - They can promote the selected users to admin role
+        - They can delete the selected users, and follow the deletion of their posts
     """
     if not is_authenticated():
         st.warning("You need to sign in to view this page.")
@@ -22,35 +29,96 @@ def admin():
 
     st.title("Admin Panel - Manage Users")
 
-    response = get("/users/all_users", token)
-    if isinstance(response, list):
-        non_admin_users = [user for user in response if user["role"] != "admin"]
+    if "delete_job_id" in st.session_state:
+        show_delete_job(token)
+    finished_job = st.session_state.pop("finished_delete_job", None)
+    if finished_job:
+        if finished_job["status"] == "done":
+            st.success(f"{finished_job['deleted_posts']} post(s) of the deleted users were removed.")
+        else:
+            st.error(f"Failed to remove the posts of the deleted users: {finished_job['error']}")
+
+    prefix = st.text_input("Search users by username", key="users_prefix_input").strip()
+    # A new search starts from its first page
+    if st.session_state.get("users_prefix") != prefix:
+        st.session_state.users_prefix = prefix
+        st.session_state.users_cursors = [None]
+        st.session_state.pop("selected_users", None)
+    cursors = st.session_state.setdefault("users_cursors", [None])
+    params = {"role": "user", "limit": USERS_PAGE_SIZE}
+    if prefix:
+        params["prefix"] = prefix
+    if cursors[-1]:
+        params["cursor"] = cursors[-1]
 
-        if not non_admin_users:
+    response = get(f"/users/all_users?{urlencode(params)}", token)
+    if isinstance(response, dict) and "users" in response:
+        non_admin_users = response["users"]
+
+        if not non_admin_users and len(cursors) == 1:
             st.info("No users available to manage.")
             return
 
-        for user in non_admin_users:
-            st.subheader(user["username"])
-            st.write(f"Role: {user['role']}")
-
-            if user["role"] != "admin":
-                if st.button(f"Make Admin - {user['username']}", key=f"make_admin_{user['username']}"):
-                    response = put(f"/users/{user['username']}/role", {"role": "admin"}, token)
-                    if response.get("message") == f"User '{user['username']}' role changed to 'admin' successfully.":
-                        st.success(f"User {user['username']} is now an admin.")
-                        st.rerun()
-                    else:
-                        st.error("Failed to update user role.")
-
-            if st.button(f"Delete Account - {user['username']}", key=f"delete_user_{user['username']}"):
-                response = delete(f"/users/{user['username']}", {}, token)
-                if response.get("message") == f"User '{user['username']}' deleted successfully.":
-                    st.success(f"User {user['username']} deleted successfully.")
-                    st.rerun()
-                else:
-                    st.error("Failed to delete user account.")
-
-            st.write("---")
+        st.dataframe([{"username": user["username"], "role": user["role"]} for user in non_admin_users],
+                     hide_index=True, use_container_width=True)
+
+        previous_column, next_column = st.columns(2)
+        if len(cursors) > 1 and previous_column.button("Previous page", key="previous_users_button"):
+            cursors.pop()
+            st.session_state.pop("selected_users", None)
+            st.rerun()
+        if response.get("next_cursor") and next_column.button("Next page", key="next_users_button"):
+            cursors.append(response["next_cursor"])
+            st.session_state.pop("selected_users", None)
+            st.rerun()
+
+        selected = st.multiselect("Select users", [user["username"] for user in non_admin_users],
+                                  key="selected_users")
+        if not selected:
+            return
+
+        make_admin_column, delete_column = st.columns(2)
+        if make_admin_column.button(f"Make Admin - {len(selected)} user(s)", key="make_admin_button"):
+            response = put("/users/roles", {"usernames": selected, "role": "admin"}, token)
+            if "usernames" in response:
+                st.success(f"{len(response['usernames'])} user(s) are now admins.")
+                del st.session_state["selected_users"]
+                st.rerun()
+            else:
+                st.error("Failed to update the user roles.")
+
+        if delete_column.button(f"Delete Accounts - {len(selected)} user(s)", key="delete_users_button"):
+            response = delete("/users", {"usernames": selected}, token)
+            if "usernames" in response:
+                st.success(f"{len(response['usernames'])} user(s) deleted successfully.")
+                del st.session_state["selected_users"]
+                if response.get("job_id"):
+                    st.session_state.delete_job_id = response["job_id"]
+                st.rerun()
+            else:
+                st.error("Failed to delete the user accounts.")
     else:
         st.error("Failed to load users. Please check your token.")
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_delete_job(token: str | None = None):
+    """
+    Helper component displaying the progress of the job deleting the posts of the deleted users.
+    It refreshes itself until the job is finished, without rerunning the whole page.
+
+    Args:
+        token (str | None, optional): The generated JWT token. Defaults to None.
+    """
+    job = get(f"/users/jobs/{st.session_state.delete_job_id}", token)
+    if "status" not in job:
+        st.session_state.pop("delete_job_id")
+        st.rerun()
+    if job["status"] in ("done", "failed"):
+        st.session_state.pop("delete_job_id")
+        st.session_state.finished_delete_job = job
+        st.rerun()
+
+    total, deleted = job["total_posts"], job["deleted_posts"]
+    st.progress(min(deleted / total, 1.0) if total else 0.0,
+                text=f"Removing the posts of the deleted users: {deleted}/{total}")
@@ -1,16 +1,21 @@
 import streamlit as st
 import time
 import base64
-from PIL import Image
-from io import BytesIO
+import requests
+from urllib.parse import quote
 from utils.api import get, post, put, delete
+from utils.cache import fetch_photo, fetch_posts_page, get_posts_generation, invalidate_posts
 from utils.auth import get_token, is_authenticated
 
+# Thumbnail displayed instead of the post photos, see THUMBNAIL_SIZES inside the backend
+THUMBNAIL_SIZE = "medium"
+
 
 def posts():
     """
     Implementation of a forum page, with the following functionalities:
         - The user can see a list of all the posts
+        - The user can search the posts
         - The user can add a new post
         - The user can edit/delete his posts
     """
@@ -47,23 +52,36 @@ def posts():
             response = post("/forum/posts", post_data, token)
             if response.get("message") == "Post created successfully.":
                 st.success(f"Post '{title}' created successfully!")
+                st.session_state.posts_cursors = [None]
+                invalidate_posts()
                 time.sleep(2)
                 st.rerun()
             else:
                 st.error(
                     "Failed to create post")
 
-    response = get("/forum/posts", token)
-    if isinstance(response, list):
-        for post_dict in response:
+    query = st.text_input("Search posts", key="search_query_input").strip()
+    if query:
+        search_posts(query, token)
+        return
+
+    cursors = st.session_state.setdefault("posts_cursors", [None])
+    endpoint = "/forum/posts"
+    if cursors[-1]:
+        endpoint += f"?cursor={quote(cursors[-1])}"
+
+    try:
+        response = fetch_posts_page(endpoint, token, get_posts_generation())
+    except requests.RequestException:
+        response = None
+    if isinstance(response, dict) and "posts" in response:
+        for post_dict in response["posts"]:
             st.subheader(f"{post_dict['title']} (ID: {post_dict['_id']})")
             st.write(post_dict["content"])
             st.write(f"Author: {post_dict['author']}")
             st.write(f"Created At: {post_dict['created_at']}")
-            if post_dict.get("photo"):
-                image_data = base64.b64decode(post_dict["photo"])
-                image = Image.open(BytesIO(image_data))
-                st.image(image, use_container_width=True)
+            if post_dict.get("photo_id"):
+                show_photo(post_dict, token)
 
             if st.button("Edit", key=f"edit_{post_dict['_id']}"):
                 st.session_state.edit_mode = True
@@ -76,10 +94,79 @@ def posts():
                 st.rerun()
 
             st.write("---")
+
+        previous_column, next_column = st.columns(2)
+        if len(cursors) > 1 and previous_column.button("Previous page", key="previous_page_button"):
+            cursors.pop()
+            st.rerun()
+        if response.get("next_cursor") and next_column.button("Next page", key="next_page_button"):
+            cursors.append(response["next_cursor"])
+            st.rerun()
     else:
         st.error("Failed to load posts")
 
 
+def search_posts(query: str, token: str | None = None):
+    """
+    Helper component displaying a page of the posts matching a search, most relevant first
+
+    Args:
+        query (str): The searched words
+        token (str | None, optional): The generated JWT token. Defaults to None.
+    """
+    # A new search starts from its first page
+    if st.session_state.get("search_query") != query:
+        st.session_state.search_query = query
+        st.session_state.search_cursors = [None]
+    cursors = st.session_state.search_cursors
+    endpoint = f"/forum/posts/search?q={quote(query)}"
+    if cursors[-1]:
+        endpoint += f"&cursor={quote(cursors[-1])}"
+
+    try:
+        response = fetch_posts_page(endpoint, token, get_posts_generation())
+    except requests.RequestException:
+        st.error("Failed to search posts")
+        return
+    if not response["results"]:
+        st.info("No post matches your search.")
+    for result in response["results"]:
+        st.subheader(f"{result['title']} (ID: {result['_id']})")
+        st.write(result["snippet"])
+        st.write(f"Author: {result['author']}")
+        st.write(f"Created At: {result['created_at']}")
+        st.write("---")
+
+    previous_column, next_column = st.columns(2)
+    if len(cursors) > 1 and previous_column.button("Previous results", key="previous_results_button"):
+        cursors.pop()
+        st.rerun()
+    if response.get("next_cursor") and next_column.button("More results", key="next_results_button"):
+        cursors.append(response["next_cursor"])
+        st.rerun()
+
+
+def show_photo(post_dict: dict, token: str | None = None):
+    """
+    Helper component displaying the thumbnail of a post photo. The full size photo is only downloaded
+    once the user asks for it. Photos without thumbnails are displayed directly.
+
+    Args:
+        post_dict (dict): The post, containing its photo_id and thumbnails
+        token (str | None, optional): The generated JWT token. Defaults to None.
+    """
+    post_id = post_dict["_id"]
+    thumbnail_id = (post_dict.get("thumbnails") or {}).get(THUMBNAIL_SIZE)
+    try:
+        if thumbnail_id:
+            st.image(fetch_photo(post_id, thumbnail_id, token, THUMBNAIL_SIZE))
+            if not st.toggle("Show full size photo", key=f"full_photo_{post_id}"):
+                return
+        st.image(fetch_photo(post_id, post_dict["photo_id"], token), use_container_width=True)
+    except requests.RequestException:
+        st.warning("Failed to load the photo.")
+
+
 def edit_post(token: str | None = None):
     """
     Implementation of a helper view that contains an editing menu for a post
@@ -102,11 +189,9 @@ def edit_post(token: str | None = None):
     new_content = st.text_area(
         "New Content", value=response.get("content"), key="edit_content_input")
 
-    if response.get("photo"):
+    if response.get("photo_id"):
         st.write("Current Photo:")
-        image_data = base64.b64decode(response["photo"])
-        image = Image.open(BytesIO(image_data))
-        st.image(image, use_container_width=True)
+        show_photo(response, token)
 
     uploaded_file = st.file_uploader(
         "Upload a new photo (optional)", type=["jpg", "jpeg", "png"])
@@ -124,6 +209,7 @@ def edit_post(token: str | None = None):
         if response.get("message") == "Post updated successfully.":
             st.success("Post updated successfully!")
             st.session_state.edit_mode = False
+            invalidate_posts()
             time.sleep(2)
             st.rerun()
         else:
@@ -144,6 +230,7 @@ def delete_post(id: str, token: str | None = None):
     """
     response = delete(f"/forum/posts/{id}", {}, token)
     if response.get("message") == "Post deleted successfully.":
+        invalidate_posts()
         st.success(f"Post '{id}' deleted successfully!")
         time.sleep(2)
     else:
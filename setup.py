@@ -3,6 +3,9 @@ from setuptools import setup, find_packages
 with open("requirements.txt") as f:
     requirements = f.read().splitlines()
 
+with open("requirements-bench.in") as f:
+    bench_requirements = [line for line in f.read().splitlines() if line and not line.startswith(("#", "-"))]
+
 setup(
     name="orion_interview",
     version="0.1.0",
@@ -11,4 +14,5 @@ setup(
     packages=find_packages(where="orion_interview"),
     package_dir={"": "orion_interview"},
     install_requires=requirements,
+    extras_require={"bench": bench_requirements, "test": bench_requirements},
 )